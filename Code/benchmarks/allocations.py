@@ -0,0 +1,103 @@
+"""
+Count the memory blocks allocated by the copies of chromosomes in the GA.
+
+Runs the same seeded GA copying the chromosomes carried to the next
+generation (parents that are not crossed and the elite) with a deep copy of
+their genes and boxes ('deepcopy') and with Chromosome.clone ('clone'), and
+prints the blocks allocated per generation by copies, crossovers and
+mutations. Both runs must reach the same best values.
+
+    python -m benchmarks.allocations --types 20 --generations 20
+"""
+import argparse
+from collections import Counter
+from copy import deepcopy
+import random
+import sys
+
+from lcp.src.algorithm import Chromosome, GeneticAlgorithm, Population
+from .common import TYPES_COUNT, load_problem_set, timed
+
+OPERATIONS = ['clone', 'crossover_one_point', 'mutate']
+
+
+def deep_clone(self: Chromosome) -> Chromosome:
+    """Copy of a chromosome as it was done with deepcopy"""
+    new_chromosome = Chromosome(deepcopy(self.genes), self.container, self.isMaxInitial)
+    new_chromosome.result = deepcopy(self.result)
+    new_chromosome.improved = self.improved
+    new_chromosome.evaluated = self.evaluated
+    new_chromosome.occupied_vol = self.occupied_vol
+    new_chromosome.number_boxes = self.number_boxes
+    new_chromosome.cost_value = self.cost_value
+    return new_chromosome
+
+
+def counting(operation, counter: Counter, name: str):
+    """Wrap a method to add the blocks still allocated after each call"""
+    def wrapper(*args, **kwargs):
+        blocks = sys.getallocatedblocks()
+        result = operation(*args, **kwargs)
+        counter[name] += sys.getallocatedblocks() - blocks
+        counter[name + ' calls'] += 1
+        return result
+    return wrapper
+
+
+def run_ga(problem, individuals: int, generations: int, seed: int) -> tuple[Counter, list]:
+    counter = Counter()
+    originals = {name: getattr(Chromosome, name) for name in OPERATIONS}
+    try:
+        for name in OPERATIONS:
+            setattr(Chromosome, name, counting(getattr(Chromosome, name), counter, name))
+        random.seed(seed)
+        population = Population(problem)
+        population.individuals = population.generate_random_individuals(individuals)
+        ga = GeneticAlgorithm(population=population, MAX_GENERATIONS=generations)
+        ga.start(population.best.fitness)
+    finally:
+        for name, operation in originals.items():
+            setattr(Chromosome, name, operation)
+    return counter, ga.stats['best_values']
+
+
+def run(types_count: list[int], individuals: int, generations: int) -> list[dict]:
+    rows = []
+    current_clone = Chromosome.clone
+    for n in types_count:
+        problem = load_problem_set(n)[0]
+        results = {}
+        for mode, clone in (('deepcopy', deep_clone), ('clone', current_clone)):
+            Chromosome.clone = clone
+            try:
+                (counter, best_values), seconds = timed(run_ga, problem, individuals,
+                                                        generations, problem.id)
+            finally:
+                Chromosome.clone = current_clone
+            results[mode] = best_values
+            rows.append({'types': n, 'mode': mode, 'seconds': seconds,
+                         **{name: counter[name] / generations for name in OPERATIONS},
+                         'copies': counter['clone calls'] / generations})
+        if results['deepcopy'] != results['clone']:
+            raise AssertionError("Different best values with %d types" % n)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--types', type=int, nargs='+', default=TYPES_COUNT)
+    parser.add_argument('--individuals', type=int, default=50)
+    parser.add_argument('--generations', type=int, default=20)
+    args = parser.parse_args()
+
+    print('Blocks allocated per generation')
+    print('%6s %9s %8s %10s %10s %10s %9s' %
+          ('types', 'mode', 'copies', 'copy', 'crossover', 'mutate', 'seconds'))
+    for row in run(args.types, args.individuals, args.generations):
+        print('%6d %9s %8.1f %10.0f %10.0f %10.0f %9.2f' %
+              (row['types'], row['mode'], row['copies'], row['clone'],
+               row['crossover_one_point'], row['mutate'], row['seconds']))
+
+
+if __name__ == '__main__':
+    main()
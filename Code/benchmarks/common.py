@@ -0,0 +1,33 @@
+from pathlib import Path
+import random
+import time
+from typing import Callable
+
+from lcp.src.problems import Problems, Problem
+from lcp.src.algorithm import Chromosome, Gene, Population
+
+PROBLEMS_DIR = Path(__file__).resolve().parents[2] / 'Instances' / 'problems'
+TYPES_COUNT = [5, 10, 20, 30, 40, 50]
+
+
+def load_problem_set(types_count: int) -> list[Problem]:
+    """Load the bundled problems with the given number of box types"""
+    return Problems(file_path=str(PROBLEMS_DIR / ('types_%d.json' % types_count))).load_problems()
+
+
+def random_genotypes(problem: Problem, count: int, seed: int = 0) -> list[list[tuple]]:
+    """Generate `count` random genotypes (box type, box count, rotation) with a fixed seed"""
+    random.seed(seed)
+    individuals = Population(problem).generate_random_individuals(count)
+    return [[(g.type, g.box_count, g.rotation) for g in i.genes] for i in individuals]
+
+
+def build_chromosome(problem: Problem, genotype: list[tuple]) -> Chromosome:
+    return Chromosome([Gene(t, c, r) for t, c, r in genotype], problem.container)
+
+
+def timed(function: Callable, *args, **kwargs) -> tuple[object, float]:
+    """Run the function and return its result and the elapsed seconds"""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
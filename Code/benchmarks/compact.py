@@ -0,0 +1,75 @@
+"""
+Compare DBLF.compact with the pairwise implementation on the bundled problem sets.
+
+Evaluates the same random chromosomes with both compactions, fails if the
+layout or any list of free spaces (side, top, front and unused) differs, and
+prints the evaluation time of each one.
+
+    python -m benchmarks.compact --problems 3 --individuals 20
+"""
+import argparse
+
+from lcp.src.algorithm import DBLF
+from .common import TYPES_COUNT, build_chromosome, load_problem_set, random_genotypes, timed
+
+COMPACTIONS = {'indexed': DBLF.compact, 'pairwise': DBLF.compact_pairwise}
+
+
+def space_state(space) -> tuple:
+    return (tuple(space.position), tuple(space.size), space.size.volume, space.group, space.type)
+
+
+def chromosome_state(chromosome) -> tuple:
+    dblf = chromosome.dblf
+    return (chromosome.fitness,
+            [(tuple(b.position), tuple(b.size), b.type) for b in chromosome.result],
+            [[space_state(s) for s in spaces]
+             for spaces in (dblf.side, dblf.top, dblf.front, dblf.unused)])
+
+
+def evaluate_all(problem, genotypes) -> list[tuple]:
+    return [chromosome_state(build_chromosome(problem, genotype).evaluate())
+            for genotype in genotypes]
+
+
+def run(types_count: list[int], problems: int, individuals: int) -> list[dict]:
+    rows = []
+    try:
+        for n in types_count:
+            times = {name: 0. for name in COMPACTIONS}
+            evaluations = 0
+            for problem in load_problem_set(n)[:problems]:
+                genotypes = random_genotypes(problem, individuals, seed=problem.id)
+                states = {}
+                for name, compact in COMPACTIONS.items():
+                    DBLF.compact = compact
+                    states[name], seconds = timed(evaluate_all, problem, genotypes)
+                    times[name] += seconds
+                if states['indexed'] != states['pairwise']:
+                    raise AssertionError("Different DBLF state in problem %s" % problem.id)
+                evaluations += len(genotypes)
+            rows.append({'types': n, 'evaluations': evaluations, **times})
+    finally:
+        DBLF.compact = COMPACTIONS['indexed']
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--types', type=int, nargs='+', default=TYPES_COUNT)
+    parser.add_argument('--problems', type=int, default=3,
+                        help='problems per set')
+    parser.add_argument('--individuals', type=int, default=20,
+                        help='random chromosomes per problem')
+    args = parser.parse_args()
+
+    print('%6s %6s %12s %12s %8s' %
+          ('types', 'evals', 'indexed s', 'pairwise s', 'speedup'))
+    for row in run(args.types, args.problems, args.individuals):
+        print('%6d %6d %12.3f %12.3f %8.2f' % (row['types'], row['evaluations'], row['indexed'],
+                                              row['pairwise'], row['pairwise'] / row['indexed']))
+    print('DBLF state identical on every evaluation')
+
+
+if __name__ == '__main__':
+    main()
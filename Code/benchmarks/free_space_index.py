@@ -0,0 +1,65 @@
+"""
+Compare the DBLF search backends on the bundled problem sets.
+
+Evaluates the same random chromosomes with the linear scan ('list'), the
+vectorized store ('array') and the dimension buckets ('bucket'), checks that
+every backend reaches the same fitness and prints evaluations per second.
+
+    python -m benchmarks.free_space_index --problems 3 --individuals 20
+"""
+import argparse
+
+from lcp.src.algorithm import DBLF
+from .common import TYPES_COUNT, build_chromosome, load_problem_set, random_genotypes, timed
+
+BACKENDS = ['list', 'array', 'bucket']
+
+
+def evaluate_all(problem, genotypes) -> list[tuple]:
+    return [build_chromosome(problem, genotype).evaluate().fitness for genotype in genotypes]
+
+
+def run(types_count: list[int], problems: int, individuals: int) -> list[dict]:
+    rows = []
+    for n in types_count:
+        times = {backend: 0. for backend in BACKENDS}
+        evaluations = 0
+        for problem in load_problem_set(n)[:problems]:
+            genotypes = random_genotypes(problem, individuals, seed=problem.id)
+            expected = None
+            for backend in BACKENDS:
+                DBLF.BACKEND = backend
+                fitness, seconds = timed(evaluate_all, problem, genotypes)
+                times[backend] += seconds
+                if expected is None:
+                    expected = fitness
+                elif fitness != expected:
+                    raise AssertionError("Backend '%s' differs from 'list' in problem %s" %
+                                         (backend, problem.id))
+            evaluations += len(genotypes)
+        DBLF.BACKEND = 'list'
+        rows.append({'types': n, 'evaluations': evaluations,
+                     **{backend: evaluations / seconds for backend, seconds in times.items()}})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--types', type=int, nargs='+', default=TYPES_COUNT)
+    parser.add_argument('--problems', type=int, default=3,
+                        help='problems per set')
+    parser.add_argument('--individuals', type=int, default=20,
+                        help='random chromosomes per problem')
+    args = parser.parse_args()
+
+    print('%6s %6s' % ('types', 'evals') +
+          ''.join('%12s' % ('%s ev/s' % b) for b in BACKENDS) +
+          ''.join('%10s' % ('x %s' % b) for b in BACKENDS[1:]))
+    for row in run(args.types, args.problems, args.individuals):
+        print('%6d %6d' % (row['types'], row['evaluations']) +
+              ''.join('%12.1f' % row[b] for b in BACKENDS) +
+              ''.join('%10.2f' % (row[b] / row['list']) for b in BACKENDS[1:]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Run the island model on one problem in processes and in a single process.
+
+Both runs must give the same statistics, since the results only depend on
+the seed. Prints the best value and the duration of each run and of a single
+GA with the same total number of individuals.
+
+    python -m benchmarks.island --types 50 --generations 20 --improvements none during late_some late_best
+"""
+import argparse
+import random
+
+from lcp.src.algorithm import GeneticAlgorithm, IslandModel, Population
+from lcp.src.algorithm.island import TOPOLOGIES
+from lcp.src.algorithm.population import GroupImprovement
+from .common import load_problem_set, timed
+
+
+def run_islands(problem, improvements, args, processes: bool) -> dict:
+    model = IslandModel(problem, improvements, INDIVIDUALS=args.individuals,
+                        MIGRATION_INTERVAL=args.interval, MIGRANTS=args.migrants,
+                        TOPOLOGY=args.topology, PROCESSES=processes,
+                        MAX_GENERATIONS=args.generations, seed=problem.id)
+    return model.start().stats
+
+
+def run_single(problem, individuals: int, generations: int) -> dict:
+    random.seed(problem.id)
+    population = Population(problem)
+    population.individuals = population.generate_random_individuals(individuals)
+    population.evaluate()
+    return GeneticAlgorithm(population=population, MAX_GENERATIONS=generations).start(None).stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--types', type=int, default=50)
+    parser.add_argument('--problem', type=int, default=0,
+                        help='index of the problem in the set')
+    parser.add_argument('--improvements', nargs='+', default=['none'] * 4,
+                        choices=[g.name for g in GroupImprovement])
+    parser.add_argument('--individuals', type=int, default=100,
+                        help='individuals per island')
+    parser.add_argument('--generations', type=int, default=20)
+    parser.add_argument('--interval', type=int, default=5)
+    parser.add_argument('--migrants', type=int, default=2)
+    parser.add_argument('--topology', default='ring', choices=TOPOLOGIES)
+    args = parser.parse_args()
+
+    problem = load_problem_set(args.types)[args.problem]
+    improvements = [GroupImprovement[name] for name in args.improvements]
+    processes, processes_seconds = timed(run_islands, problem, improvements, args, True)
+    local, local_seconds = timed(run_islands, problem, improvements, args, False)
+    single, single_seconds = timed(run_single, problem, args.individuals * len(improvements),
+                                   args.generations)
+    if processes['best_values'] != local['best_values'] or \
+            processes['best_solution'] != local['best_solution']:
+        raise AssertionError("The island processes give different results")
+
+    print('%18s %10s %s' % ('', 'seconds', 'best value'))
+    print('%18s %10.2f %s' % ('islands processes', processes_seconds, processes['best_value']))
+    print('%18s %10.2f %s' % ('islands local', local_seconds, local['best_value']))
+    print('%18s %10.2f %s' % ('single population', single_seconds, single['best_value']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare the serial and the parallel evaluation of populations in the GA.
+
+Runs the same seeded GA on one problem evaluating the populations in this
+process and in a ParallelEvaluator, fails if the best values or the final
+population differ and prints the duration of both runs.
+
+    python -m benchmarks.parallel --types 50 --workers 8 --generations 10
+"""
+import argparse
+import random
+
+from lcp.src.algorithm import GeneticAlgorithm, ParallelEvaluator, Population
+from lcp.src.algorithm.population import GroupImprovement
+from .common import load_problem_set, timed
+
+
+def run_ga(problem, group_improvement: GroupImprovement, individuals: int, generations: int,
+           evaluator=None) -> tuple:
+    random.seed(problem.id)
+    population = Population(problem, group_improvement, evaluator=evaluator)
+    population.individuals = population.generate_random_individuals(individuals)
+    population.evaluate()
+    ga = GeneticAlgorithm(population=population, MAX_GENERATIONS=generations)
+    ga.start(population.best.fitness)
+    return ga.stats['best_values'], [i.fitness for i in ga.population]
+
+
+def run(types: int, problem_index: int, workers: int, individuals: int, generations: int) -> list[dict]:
+    problem = load_problem_set(types)[problem_index]
+    rows = []
+    with ParallelEvaluator(problem, workers) as evaluator:
+        for group_improvement in GroupImprovement:
+            serial, serial_seconds = timed(run_ga, problem, group_improvement,
+                                           individuals, generations)
+            parallel, parallel_seconds = timed(run_ga, problem, group_improvement,
+                                               individuals, generations, evaluator)
+            if serial != parallel:
+                raise AssertionError("Different results with %s" % group_improvement.name)
+            rows.append({'improvement': group_improvement.name,
+                         'serial': serial_seconds, 'parallel': parallel_seconds})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--types', type=int, default=50)
+    parser.add_argument('--problem', type=int, default=0,
+                        help='index of the problem in the set')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--individuals', type=int, default=100)
+    parser.add_argument('--generations', type=int, default=10)
+    args = parser.parse_args()
+
+    print('%10s %10s %10s %8s' % ('', 'serial s', 'parallel s', 'speedup'))
+    for row in run(args.types, args.problem, args.workers, args.individuals, args.generations):
+        print('%10s %10.2f %10.2f %8.2f' % (row['improvement'], row['serial'], row['parallel'],
+                                            row['serial'] / row['parallel']))
+    print('Same results in both evaluations')
+
+
+if __name__ == '__main__':
+    main()
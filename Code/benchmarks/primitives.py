@@ -0,0 +1,66 @@
+"""
+Measure the construction time and the memory of the geometry primitives.
+
+Times the construction of Position, Size, FreeSpace and Box, the split of a
+free space and the unpacking of a space, and measures with tracemalloc the
+bytes taken by each instance (including its position and size).
+
+    python -m benchmarks.primitives --count 200000
+"""
+import argparse
+import timeit
+import tracemalloc
+
+from lcp.src.location import Position, Size
+from lcp.src.container import Box, FreeSpace
+
+SETUP = {'Position': Position, 'Size': Size, 'FreeSpace': FreeSpace, 'Box': Box,
+         'space': FreeSpace(Position(10, 20, 30), Size(400, 300, 200), 'side'),
+         'box_size': Size(100, 50, 40)}
+
+STATEMENTS = {
+    'Position': 'Position(10, 20, 30)',
+    'Size': 'Size(100, 50, 40)',
+    'FreeSpace': "FreeSpace(Position(10, 20, 30), Size(100, 50, 40), 'side', 1)",
+    'Box': 'Box(Position(10, 20, 30), Size(100, 50, 40), 1)',
+    'split': 'space.split(box_size, 1)',
+    'unpack': 'x, y, z, l, w, h = space',
+}
+
+
+def instance_bytes(statement: str, count: int) -> float:
+    """Bytes allocated per instance keeping `count` instances alive"""
+    code = compile('[%s for _ in range(count)]' % statement, '<primitives>', 'eval')
+    tracemalloc.start()
+    instances = eval(code, {**SETUP, 'count': count})
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Descontar la lista que guarda las instancias
+    return (current - 8 * len(instances)) / count
+
+
+def run(count: int, repeat: int) -> list[dict]:
+    rows = []
+    for name, statement in STATEMENTS.items():
+        seconds = min(timeit.repeat(statement, globals=SETUP, number=count, repeat=repeat))
+        row = {'name': name, 'ns': seconds / count * 1e9}
+        if name not in ('split', 'unpack'):
+            row['bytes'] = instance_bytes(statement, count)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('%10s %10s %10s' % ('', 'ns/op', 'bytes'))
+    for row in run(args.count, args.repeat):
+        print('%10s %10.1f %10s' % (row['name'], row['ns'],
+                                    '%.0f' % row['bytes'] if 'bytes' in row else '-'))
+
+
+if __name__ == '__main__':
+    main()
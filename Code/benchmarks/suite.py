@@ -0,0 +1,251 @@
+"""
+Benchmark suite of the packing engine on the bundled problem sets.
+
+For every number of box types, and every local OR-Library thpack file given
+with --literature, it measures:
+
+- the time per call of DBLF.first_available, DBLF.compact,
+  DBLF.remove_unreachable and FreeSpace.split while evaluating random
+  chromosomes (the timer adds about 0.1 us to each call),
+- the evaluations per second of Chromosome.evaluate,
+- a GeneticAlgorithm with a fixed number of generations, in generations and
+  evaluations per second,
+- the peak memory of the GA measured with tracemalloc in a separate run.
+
+The evaluations per second by number of types are the scaling curve of the
+engine. The results are saved with --save and compared with --compare, which
+fails if the fitness of any evaluation or the best values of the GA changed,
+or if any throughput is below the baseline by more than --tolerance.
+
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --compare baseline.json --tolerance 0.15
+    python -m benchmarks.suite --types 5 --literature thpack1.txt.gz
+"""
+import argparse
+from collections import Counter
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Iterator
+
+from lcp.src.algorithm import DBLF, Chromosome, GeneticAlgorithm, Population
+from lcp.src.container import FreeSpace
+from lcp.src.problems import Problems
+from .common import TYPES_COUNT, build_chromosome, load_problem_set, random_genotypes, timed
+
+OPERATIONS = {
+    'first_available': (DBLF, 'first_available'),
+    'compact': (DBLF, 'compact'),
+    'remove_unreachable': (DBLF, 'remove_unreachable'),
+    'split': (FreeSpace, 'split'),
+}
+# Métricas en las que un valor mayor es mejor, las demás son tiempos o memoria
+THROUGHPUTS = ['evaluations_per_second', 'ga_generations_per_second', 'ga_evaluations_per_second']
+
+
+def timing(operation, calls: Counter, seconds: Counter, name: str):
+    """Wrap a method to count its calls and the seconds spent in them"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = operation(*args, **kwargs)
+        seconds[name] += time.perf_counter() - start
+        calls[name] += 1
+        return result
+    return wrapper
+
+
+def checksum(values: list) -> str:
+    return hashlib.sha1(repr(values).encode()).hexdigest()
+
+
+def evaluate_all(problems: list, genotypes: list) -> list[tuple]:
+    return [build_chromosome(problem, genotype).evaluate().fitness
+            for problem, problem_genotypes in zip(problems, genotypes)
+            for genotype in problem_genotypes]
+
+
+def run_operations(problems: list, genotypes: list) -> dict:
+    """Microseconds per call of every operation during the evaluations"""
+    calls, seconds = Counter(), Counter()
+    originals = {name: getattr(owner, attribute) for name, (owner, attribute) in OPERATIONS.items()}
+    try:
+        for name, (owner, attribute) in OPERATIONS.items():
+            setattr(owner, attribute, timing(originals[name], calls, seconds, name))
+        evaluate_all(problems, genotypes)
+    finally:
+        for name, (owner, attribute) in OPERATIONS.items():
+            setattr(owner, attribute, originals[name])
+    return {name: {'calls': calls[name],
+                   'us_per_call': 1e6 * seconds[name] / calls[name] if calls[name] else 0.}
+            for name in OPERATIONS}
+
+
+def run_ga(problem, individuals: int, generations: int) -> tuple[list, int]:
+    """Seeded GA without cache, returns its best values and the number of evaluations"""
+    evaluations = Counter()
+    evaluate = Chromosome.evaluate
+
+    def counting(self, *args, **kwargs):
+        evaluations['evaluate'] += 1
+        return evaluate(self, *args, **kwargs)
+
+    Chromosome.evaluate = counting
+    try:
+        random.seed(problem.id)
+        population = Population(problem)
+        population.individuals = population.generate_random_individuals(individuals)
+        population.evaluate()
+        ga = GeneticAlgorithm(population=population, MAX_GENERATIONS=generations)
+        ga.start(population.best.fitness)
+    finally:
+        Chromosome.evaluate = evaluate
+    return ga.stats['best_values'], evaluations['evaluate']
+
+
+def peak_memory(function, *args) -> tuple[object, int]:
+    """Run the function and return its result and the peak of bytes allocated"""
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def problem_sets(types_count: list[int], literature: list[str]) -> Iterator[tuple[str, list]]:
+    """The bundled sets by number of types, and the local OR-Library files"""
+    for n in types_count:
+        yield str(n), load_problem_set(n)
+    for file_path in literature:
+        yield os.path.basename(file_path), list(Problems(file_path=file_path).read_literature_problems())
+
+
+def run(types_count: list[int], problems: int, individuals: int, generations: int,
+        memory: bool = True, literature: list[str] = ()) -> dict:
+    rows = {}
+    for n, problem_set in problem_sets(types_count, literature):
+        problem_set = problem_set[:problems]
+        genotypes = [random_genotypes(problem, individuals, seed=problem.id)
+                     for problem in problem_set]
+        evaluations = sum(len(g) for g in genotypes)
+
+        fitness, seconds = timed(evaluate_all, problem_set, genotypes)
+        operations = run_operations(problem_set, genotypes)
+        (best_values, ga_evaluations), ga_seconds = timed(run_ga, problem_set[0],
+                                                          individuals, generations)
+        row = {
+            'evaluations': evaluations,
+            'evaluations_per_second': evaluations / seconds,
+            'us_per_evaluation': 1e6 * seconds / evaluations,
+            'operations': operations,
+            'ga_seconds': ga_seconds,
+            'ga_generations_per_second': generations / ga_seconds,
+            'ga_evaluations_per_second': ga_evaluations / ga_seconds,
+            'fitness_checksum': checksum(fitness),
+            'ga_best_values': best_values,
+        }
+        if memory:
+            (memory_best_values, _), peak = peak_memory(run_ga, problem_set[0],
+                                                        individuals, generations)
+            if memory_best_values != best_values:
+                raise AssertionError("Different GA results in set %s" % n)
+            row['ga_peak_kib'] = peak / 1024
+        rows[n] = row
+    return rows
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Differences with the baseline that make the suite fail"""
+    if current['settings'] != baseline['settings']:
+        return ["Different settings: %s, baseline %s" % (current['settings'], baseline['settings'])]
+    failures = []
+    print('\n%12s %-28s %12s %12s %8s' % ('set', 'metric', 'baseline', 'current', 'ratio'))
+    for n, row in current['rows'].items():
+        base = baseline['rows'].get(n)
+        if base is None:
+            continue
+        if row['fitness_checksum'] != base['fitness_checksum']:
+            failures.append("Different fitness of the evaluations in set %s" % n)
+        if row['ga_best_values'] != base['ga_best_values']:
+            failures.append("Different best values of the GA in set %s" % n)
+        metrics = [(name, base[name], row[name], True) for name in THROUGHPUTS] + \
+            [('%s us/call' % name, base['operations'][name]['us_per_call'],
+              operation['us_per_call'], False) for name, operation in row['operations'].items()]
+        for name, base_value, value, higher_is_better in metrics:
+            # Razón mayor que 1 cuando mejora, también en los tiempos por llamada
+            if not base_value or not value:
+                continue
+            ratio = value / base_value if higher_is_better else base_value / value
+            print('%12s %-28s %12.2f %12.2f %8.2f' % (n, name, base_value, value, ratio))
+            if ratio < 1 - tolerance:
+                failures.append("%s in set %s is %.0f%% slower" % (name, n, 100 * (1 - ratio)))
+        if 'ga_peak_kib' in row and 'ga_peak_kib' in base:
+            ratio = row['ga_peak_kib'] / base['ga_peak_kib']
+            print('%12s %-28s %12.0f %12.0f %8.2f' % (n, 'ga_peak_kib', base['ga_peak_kib'],
+                                                     row['ga_peak_kib'], 1 / ratio))
+            if ratio > 1 + tolerance:
+                failures.append("Peak memory in set %s is %.0f%% higher" % (n, 100 * (ratio - 1)))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--types', type=int, nargs='+', default=TYPES_COUNT)
+    parser.add_argument('--problems', type=int, default=2,
+                        help='problems per set')
+    parser.add_argument('--individuals', type=int, default=20,
+                        help='random chromosomes per problem and size of the GA population')
+    parser.add_argument('--generations', type=int, default=5)
+    parser.add_argument('--literature', nargs='+', default=[],
+                        help='local OR-Library thpack files, plain or gzip')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the run with tracemalloc')
+    parser.add_argument('--save', help='save the results as a baseline JSON')
+    parser.add_argument('--compare', help='baseline JSON to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed slowdown with respect to the baseline')
+    args = parser.parse_args()
+
+    settings = {'types': args.types, 'literature': args.literature, 'problems': args.problems,
+                'individuals': args.individuals, 'generations': args.generations}
+    results = {
+        'settings': settings,
+        'python': sys.version.split()[0],
+        'machine': platform.machine(),
+        'rows': run(args.types, args.problems, args.individuals, args.generations,
+                    memory=not args.no_memory, literature=args.literature),
+    }
+
+    print('%12s %10s %10s %10s %10s %10s %10s %10s %10s' %
+          ('set', 'evals/s', 'us/eval', 'first us', 'compact us', 'unreach us',
+           'split us', 'GA gen/s', 'peak KiB'))
+    for n, row in results['rows'].items():
+        operations = row['operations']
+        print('%12s %10.1f %10.0f %10.2f %10.2f %10.2f %10.2f %10.2f %10s' %
+              (n, row['evaluations_per_second'], row['us_per_evaluation'],
+               operations['first_available']['us_per_call'], operations['compact']['us_per_call'],
+               operations['remove_unreachable']['us_per_call'], operations['split']['us_per_call'],
+               row['ga_generations_per_second'],
+               '%.0f' % row['ga_peak_kib'] if 'ga_peak_kib' in row else '-'))
+
+    if args.save:
+        with open(args.save, 'w') as outfile:
+            json.dump(results, outfile, indent=1)
+    if args.compare:
+        with open(args.compare) as infile:
+            failures = compare(results, json.load(infile), args.tolerance)
+        for failure in failures:
+            print(failure)
+        if failures:
+            sys.exit(1)
+        print('Same results as the baseline, no throughput below the tolerance')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
 import random
-import json
+from contextlib import nullcontext
 from Code.src.problems.problems import Problems
-from Code.src.algorithm import Population, GeneticAlgorithm
+from Code.src.problems.problem_cache import ProblemCache
+from Code.src.algorithm import Chromosome, FitnessCache, ParallelEvaluator, Population, GeneticAlgorithm
 from Code.src.algorithm.population import GroupImprovement
-from concurrent.futures import ProcessPoolExecutor
+from Code.src.experiment import ExperimentRunner, ResultsFile
 
 types_count = [5, 10, 20, 30, 40, 50]
 
@@ -21,51 +22,91 @@ improvements = [GroupImprovement.none,
                 ]
 
 MAX_DURATION = 600
+# Terminar antes los problemas que no mejoran
+STOP_UNIMPROVED = 1000
+# Repartir el tiempo no usado entre los problemas siguientes, hasta el doble de MAX_DURATION.
+# Todas las mejoras de un problema reciben el mismo tiempo
+SHARE_UNUSED_BUDGET = False
+MAX_BUDGET_FACTOR = 2 if SHARE_UNUSED_BUDGET else 1
+# Reutilizar la evaluación de los genes compartidos con los padres
+Chromosome.SNAPSHOT_BUDGET = 8
+# Solo se guardan las estadísticas, las cajas se obtienen con materialize_layout
+Chromosome.STORE_LAYOUT = False
+# Procesos que evalúan las poblaciones de cada problema (1: en el mismo proceso).
+# Con más de 1, reducir max_workers para no usar más procesos que núcleos
+EVALUATION_WORKERS = 1
 
 random.seed(42)
 
 
-def solve(args):
-    problem, imp, num_types = args
+def solve(args, max_duration=MAX_DURATION):
+    cache_path, problem_id, imp, num_types, num_boxes = args
+    # Leer solo este problema del cache compilado en main
+    problem = ProblemCache(cache_path).problem(problem_id)
     random.seed(problem.id)  # usar la misma semilla para cada problema
 
-    population = Population(problem)
-    individuals = population.generate_random_individuals(100)
-    population.individuals = individuals
-    population.evaluate()
-    first_best_fitness = population.best.fitness
-
-    if imp != GroupImprovement.none:
-        population = Population(problem, imp)
+    with ParallelEvaluator(problem, EVALUATION_WORKERS) if EVALUATION_WORKERS > 1 else nullcontext() as evaluator:
+        population = Population(problem, evaluator=evaluator)
+        individuals = population.generate_random_individuals(100)
         population.individuals = individuals
         population.evaluate()
+        first_best_fitness = population.best.fitness
+
+        if imp != GroupImprovement.none:
+            population = Population(problem, imp, evaluator=evaluator)
+            population.individuals = individuals
+            population.evaluate()
+        population.cache = FitnessCache()
+
+        ga = GeneticAlgorithm(population=population,
+                              MAX_DURATION=max_duration,
+                              STOP_UNIMPROVED=STOP_UNIMPROVED,
+                              P_MUT_GEN=1/num_types,
+                              )
+        ga.start(first_best_fitness)
+    stats = ga.stats
+    stats['budget'] = {'max_duration': max_duration, 'stop_unimproved': STOP_UNIMPROVED}
+    return stats
+
 
-    ga = GeneticAlgorithm(population=population,
-                          MAX_DURATION=MAX_DURATION,
-                          P_MUT_GEN=1/num_types,
-                          )
-    ga.start(first_best_fitness)
-    return ga.stats
+def jobs():
+    """(problem_id, group_improvement) and arguments of every job, loading one set at a time"""
+    for i in types_count:
+        # if i in [40, 50]:
+        problems = ProblemCache.open('problems/types_%d.json' % i)
+        for problem in problems:
+            num_types = len(problem.box_types)
+            num_boxes = sum(t.max_count for t in problem.box_types)
+            for imp in improvements:
+                yield (problem.id, imp.name), (problems.path, problem.id, imp, num_types, num_boxes)
+
+
+def expected_cost(args):
+    """Costo relativo de un trabajo: número de tipos por número de cajas"""
+    cache_path, problem_id, imp, num_types, num_boxes = args
+    return num_types * num_boxes
 
 
 def main():
-    with ProcessPoolExecutor(max_workers=8) as executor:
-        args = []
-        for i in types_count:
-            # if i in [40, 50]:
-            problems = Problems(file_path='problems/types_%d.json' %
-                                i).load_problems()
-            for problem in problems:
-                num_types = len(problem.box_types)
-                args += [(problem, imp, num_types) for imp in improvements]
-        # print("Cantidad de problemas a resolver: %s" % len(args))
-        results = executor.map(solve, args)
-
-        for result in results:
-            with open('results.txt', 'a') as outfile:
-                json.dump(result, outfile)
-                outfile.write('\n')
-            print("\rProblema resuelto: %s" % result['problem_id'])
+    # Los resultados ya guardados en results.txt no se vuelven a calcular si se obtuvieron
+    # con los mismos ajustes, los trabajos más costosos se ejecutan primero
+    runner = ExperimentRunner(ResultsFile('results.txt'), max_workers=8,
+                              cost=expected_cost, budget=MAX_DURATION,
+                              MAX_BUDGET_FACTOR=MAX_BUDGET_FACTOR,
+                              budget_group=lambda key: key[0],
+                              settings={'max_duration': MAX_DURATION,
+                                        'stop_unimproved': STOP_UNIMPROVED,
+                                        'max_budget_factor': MAX_BUDGET_FACTOR})
+
+    def onResult(result):
+        projection = runner.projection()
+        print("\rProblema resuelto: %s, faltan %d, fin estimado en %.1f h" %
+              (result['problem_id'], projection['remaining_jobs'],
+               projection['remaining_seconds'] / 3600))
+
+    runner.run(solve, jobs(), onResult)
+    print("Resueltos: %d, ya guardados: %d, fallidos: %d" %
+          (runner.completed, runner.skipped, len(runner.failed)))
 
 
 if __name__ == "__main__":
@@ -1,5 +1,14 @@
+from .free_space_store import FreeSpaceStore
+from .free_space_index import FreeSpaceIndex
 from .dblf import DBLF
+from .profiler import Profiler
 from .gene import Gene
 from .chromosome import Chromosome
+from .compiled_problem import CompiledProblem
+from .fitness_cache import FitnessCache
+from .parallel import ParallelEvaluator
 from .population import Population
+from .population_arrays import PopulationArrays
 from .genetic_algorithm import GeneticAlgorithm
+from .checkpoint import Checkpoint
+from .island import IslandModel
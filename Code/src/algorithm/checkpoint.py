@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+import gzip
+import os
+import pickle
+from typing import Optional
+
+from lcp.src.problems import Problem
+from .chromosome import Chromosome, Improvement
+from .compiled_problem import CompiledProblem, Genotype
+from .fitness_cache import CacheEntry
+
+
+@dataclass
+class SavedChromosome:
+    """
+    Evaluated chromosome reduced to its genotype and the result of its evaluation.
+
+    Attributes:
+        genotype (Genotype): (type, box_count, rotation) of every gene.
+        entry (CacheEntry): The result of its evaluation, without the boxes.
+        improvement (str): Name of the Improvement used to evaluate it.
+        late_improved (bool): Whether the result includes the late improvement.
+        decoded_counts (tuple[int, ...]): Box counts before the late improvement.
+        is_max_initial (bool): The isMaxInitial of the chromosome.
+    """
+    genotype: Genotype
+    entry: CacheEntry
+    improvement: str
+    late_improved: bool
+    decoded_counts: tuple[int, ...]
+    is_max_initial: bool = False
+
+    @staticmethod
+    def save(chromosome: Chromosome) -> 'SavedChromosome':
+        return SavedChromosome(chromosome.genotype, CacheEntry.from_chromosome(chromosome),
+                               (chromosome.improvement or Improvement.none).name,
+                               chromosome.late_improved, chromosome.decoded_counts,
+                               chromosome.isMaxInitial)
+
+    def restore(self, compiled: CompiledProblem) -> Chromosome:
+        """Rebuild the evaluated chromosome, its boxes are obtained with materialize_layout"""
+        entry = self.entry
+        chromosome = compiled.chromosome(self.genotype)
+        chromosome.isMaxInitial = self.is_max_initial
+        return chromosome.restore(entry.box_counts, entry.occupied_vol, entry.number_boxes,
+                                  entry.cost_value, entry.improved, Improvement[self.improvement],
+                                  late_improved=self.late_improved,
+                                  decoded_counts=self.decoded_counts)
+
+
+@dataclass
+class Checkpoint:
+    """
+    State of a GeneticAlgorithm between two generations.
+
+    The individuals that are the same object in the population are saved
+    once. The fitness cache is not saved, only its size, it does not change
+    the results of the run.
+
+    Attributes:
+        problem (Problem): The problem of the population.
+        group_improvement (str): Name of the GroupImprovement of the population.
+        individuals (list[SavedChromosome]): The different chromosomes of the population.
+        order (list[int]): Index in `individuals` of every chromosome of the population.
+        elite (SavedChromosome): The best chromosome found.
+        settings (dict): The parameters of the GeneticAlgorithm.
+        state (dict): The counters and statistics of the run.
+        random_state (tuple): State of the random module.
+        cache (Optional[tuple[int, bool]]): maxsize and store_layout of the fitness cache.
+    """
+    problem: Problem
+    group_improvement: str
+    individuals: list[SavedChromosome]
+    order: list[int]
+    elite: SavedChromosome
+    settings: dict
+    state: dict
+    random_state: tuple
+    cache: Optional[tuple[int, bool]] = None
+
+    def save(self, path: str):
+        """Write the checkpoint replacing the previous one only when it is complete"""
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as file:
+                pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temporary, path)
+
+    @staticmethod
+    def load(path: str) -> 'Checkpoint':
+        with gzip.open(path, 'rb') as file:
+            return pickle.load(file)
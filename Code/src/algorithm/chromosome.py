@@ -1,19 +1,56 @@
-from copy import copy, deepcopy
+from copy import copy
 from dataclasses import dataclass, field
 from enum import Enum
 # import logging
 import random
+from typing import ClassVar, Optional
 
 from lcp.src.location import Position
 from lcp.src.container import Box, Container, FreeSpace
 from .gene import Gene
-from .dblf import DBLF
+from .dblf import DBLF, copy_space
+from .profiler import Profiler
 
 Improvement = Enum('Improvement', ['none', 'during', 'late'])
 
 
 @dataclass
-class Chromosome(list):
+class Snapshot:
+    """
+    State of an evaluation after placing the first genes of a chromosome.
+
+    Attributes:
+        genes (tuple): (type, box_count, rotation) of the genes already placed.
+        dblf (DBLF): Copy of the free spaces before removing the unreachable ones,
+            its unused list is shared with the evaluated chromosome.
+        unused_count (int): Number of unused spaces at the time of the snapshot.
+        min_pos (Position): Lower corner of the boxes of the last placed gene.
+        max_pos (Position): Upper corner of the boxes of the last placed gene.
+        box_number (int): Number of boxes placed for the last gene.
+    """
+    genes: tuple[tuple[int, int, int], ...]
+    dblf: DBLF
+    unused_count: int
+    min_pos: Position
+    max_pos: Position
+    box_number: int
+    occupied_vol: int
+    number_boxes: int
+    cost_value: int
+    result_count: int
+    improved: bool
+
+
+@dataclass
+class Chromosome:
+    # Número máximo de snapshots guardados por cromosoma evaluado (0 los desactiva)
+    SNAPSHOT_BUDGET: ClassVar[int] = 0
+    # Colocar en un solo paso los bloques de cajas iguales que caben en un espacio
+    BULK_PLACEMENT: ClassVar[bool] = True
+    # Guardar las cajas colocadas al evaluar, sin ellas solo se calcula el fitness
+    # y materialize_layout las obtiene cuando se necesitan
+    STORE_LAYOUT: ClassVar[bool] = True
+
     genes: list[Gene]
     container: Container
     isMaxInitial: bool = field(default=False)
@@ -24,21 +61,71 @@ class Chromosome(list):
     occupied_vol: int = field(default=0, init=False)
     number_boxes: int = field(default=0, init=False)
     cost_value: int = field(default=0, init=False)
+    improvement: Optional[Improvement] = field(
+        default=None, init=False, repr=False, compare=False)
+    snapshots: dict[int, Snapshot] = field(
+        default_factory=dict, init=False, repr=False, compare=False)
+    # Cromosoma evaluado que comparte los primeros genes y cuántos comparte
+    prefix_source: Optional[tuple['Chromosome', int]] = field(
+        default=None, init=False, repr=False, compare=False)
+    # Los espacios no usados se comparten con snapshots y se copian antes de modificarlos
+    shared_unused: bool = field(
+        default=False, init=False, repr=False, compare=False)
+    # La lista de cajas se comparte con una copia y se copia antes de añadir cajas
+    shared_result: bool = field(
+        default=False, init=False, repr=False, compare=False)
+    # Evaluado con un resultado ya calculado, sin los espacios libres
+    restored: bool = field(
+        default=False, init=False, repr=False, compare=False)
+    # El resultado incluye la mejora tardía
+    late_improved: bool = field(
+        default=False, init=False, repr=False, compare=False)
+    # result tiene todas las cajas colocadas
+    has_layout: bool = field(
+        default=False, init=False, repr=False, compare=False)
+    # Número de cajas de cada gen con las que se decodifican las cajas, antes de la mejora tardía
+    decoded_counts: Optional[tuple[int, ...]] = field(
+        default=None, init=False, repr=False, compare=False)
+    # Tupla del fitness, se calcula al leerla y se descarta al cambiar los contadores
+    fitness_value: Optional[tuple[int, int, float, int]] = field(
+        default=None, init=False, repr=False, compare=False)
+    # Entero con el mismo orden que fitness_value, se calcula junto con ella
+    key_value: int = field(default=0, init=False, repr=False, compare=False)
+    # La evaluación con umbral se detuvo porque el valor no podía alcanzarlo
+    dominated: bool = field(default=False, init=False, repr=False, compare=False)
 
     def __deepcopy__(self, memo):
-        # Create a new instance of the class
+        return self.clone()
+
+    def clone(self) -> 'Chromosome':
+        """
+        Copy the chromosome without copying its genes or its boxes.
+
+        The genes are never modified once they belong to a chromosome, a changed
+        gene replaces the old one in the list. The list of boxes is shared with
+        the copy until one of them adds a box.
+
+        Returns:
+            Chromosome: An evaluated copy with the same fitness.
+        """
         new_chromosome = Chromosome(
-            deepcopy(self.genes, memo),
+            list(self.genes),
             self.container,
             self.isMaxInitial)
 
-        # Copy the attributes
-        new_chromosome.result = deepcopy(self.result, memo)
+        new_chromosome.result = self.result
+        new_chromosome.shared_result = self.shared_result = True
         new_chromosome.improved = self.improved
         new_chromosome.evaluated = self.evaluated
         new_chromosome.occupied_vol = self.occupied_vol
         new_chromosome.number_boxes = self.number_boxes
         new_chromosome.cost_value = self.cost_value
+        new_chromosome.improvement = self.improvement
+        new_chromosome.late_improved = self.late_improved
+        new_chromosome.has_layout = self.has_layout
+        new_chromosome.decoded_counts = self.decoded_counts
+        new_chromosome.fitness_value = self.fitness_value
+        new_chromosome.key_value = self.key_value
 
         return new_chromosome
 
@@ -54,6 +141,32 @@ class Chromosome(list):
 
     @property
     def fitness(self):
+        if self.fitness_value is None:
+            self.fitness_value = self.calculate_fitness()
+            self.key_value = self.pack_fitness(self.fitness_value)
+        return self.fitness_value
+
+    @property
+    def fitness_key(self) -> int:
+        """The fitness packed in an integer, comparing keys gives the same order as comparing fitness"""
+        if self.fitness_value is None:
+            self.fitness
+        return self.key_value
+
+    def pack_fitness(self, fitness: tuple[int, int, float, int]) -> int:
+        """
+        Pack the value, the types used, the occupied volume and the number of boxes in bit fields.
+
+        The occupied volume has the same order as its ratio. The number of
+        types is at most the number of genes, and the volume and the number of
+        boxes at most the volume of the container.
+        """
+        types_bits = len(self.genes).bit_length()
+        volume_bits = self.container.volume.bit_length()
+        return (((fitness[0] << types_bits | fitness[1]) << volume_bits |
+                 self.occupied_vol) << volume_bits) | fitness[3]
+
+    def calculate_fitness(self) -> tuple[int, int, float, int]:
         return (
             # Número de tipos de cajas usados
             self.cost_value,  # Valor de la carga
@@ -63,6 +176,27 @@ class Chromosome(list):
             self.number_boxes,  # Número de cajas usadas
         )
 
+    @property
+    def genotype(self) -> tuple[tuple[int, int, int], ...]:
+        return tuple((g.type.type, g.box_count, g.rotation) for g in self.genes)
+
+    @property
+    def canonical_genotype(self) -> tuple[tuple[int, int, int, int], ...]:
+        """
+        Key of the genotype, equal for the chromosomes that place the same boxes.
+
+        A gene without boxes places nothing, it only gives its length as the
+        depth of the reachable spaces after the gene before it. So the key has
+        the (type, box_count, rotation) of every gene with boxes, in order, and
+        the length of the next gene, 0 for the last one. The order and rotation
+        of the other genes do not change the evaluation, the late improvement
+        uses all the genes and the key does not apply to it.
+        """
+        genes = self.genes
+        last = len(genes) - 1
+        return tuple((g.type.type, g.box_count, g.rotation, genes[i + 1].size.length if i < last else 0)
+                     for i, g in enumerate(genes) if g.box_count > 0)
+
     @property
     def get_fitness(self):
         if not self.evaluated:
@@ -70,66 +204,237 @@ class Chromosome(list):
         return self.cost_value
 
     def __post_init__(self):
-        super().__init__(self.genes)
         self.result = []
         self.dblf = DBLF(
             side=[FreeSpace(Position(0, 0, 0), self.container, 'side')])
 
+    def restore(self, box_counts: tuple[int, ...], occupied_vol: int, number_boxes: int, cost_value: int,
+                improved: bool, improvement: Improvement, result: Optional[list[Box]] = None,
+                late_improved: bool = False, decoded_counts: Optional[tuple[int, ...]] = None) -> 'Chromosome':
+        """
+        Mark the chromosome as evaluated with the result of a previous evaluation of the same genes.
+
+        If `late_improved` the result already includes the late improvement and
+        evaluate_with_improvement_late does not change it, `decoded_counts` are
+        then the box counts before the late improvement. Without `result` the
+        boxes are obtained with materialize_layout.
+        """
+        for g_i, box_count in enumerate(box_counts):
+            self.set_box_count(g_i, box_count)
+        self.occupied_vol = occupied_vol
+        self.number_boxes = number_boxes
+        self.cost_value = cost_value
+        self.fitness_value = None
+        self.improved = improved
+        self.improvement = improvement
+        self.result = list(result) if result is not None else []
+        self.has_layout = result is not None
+        self.decoded_counts = decoded_counts or tuple(box_counts)
+        self.shared_result = False
+        self.prefix_source = None
+        self.evaluated = True
+        self.restored = True
+        self.late_improved = late_improved
+        return self
+
+    def set_box_count(self, index: int, box_count: int):
+        """Replace the gene at `index` with a copy with another number of boxes"""
+        gene = self.genes[index]
+        if gene.box_count != box_count:
+            self.genes[index] = gene.with_box_count(box_count)
+            self.fitness_value = None
+
     def __str__(self) -> str:
         return f"""Chromosome with {len(self.genes)} genes
 {chr(10).join([str(g) for g in self.genes])}
 Fitness: {self.fitness}"""
 
-    def evaluate(self, improvement: Improvement = Improvement.none) -> 'Chromosome':
+    def _find_snapshot(self, improvement: Improvement) -> Optional[tuple[int, Snapshot]]:
+        """Find the latest snapshot of the prefix source that matches the genes of this chromosome"""
+        source, point = self.prefix_source
+        if source.improvement != improvement:
+            return None
+        for index in sorted(source.snapshots, reverse=True):
+            if index > point:
+                continue
+            snapshot = source.snapshots[index]
+            if snapshot.genes == tuple((g.type.type, g.box_count, g.rotation) for g in self.genes[:index]):
+                return index, snapshot
+        return None
+
+    def _save_snapshot(self, index: int, min_pos: Position, max_pos: Position, box_number: int,
+                       occupied_vol: int, number_boxes: int, value: int, result: list[Box]):
+        self.snapshots[index] = Snapshot(
+            tuple((g.type.type, g.box_count, g.rotation)
+                  for g in self.genes[:index]),
+            self.dblf.copy(copy_unused=False), len(self.dblf.unused),
+            min_pos, max_pos, box_number,
+            occupied_vol, number_boxes, value, len(result), self.improved)
+
+    def evaluate(self, improvement: Improvement = Improvement.none, layout: Optional[bool] = None,
+                 threshold: Optional[int] = None) -> 'Chromosome':
+        """
+        Place the boxes of the genes in the container and calculate the fitness.
+
+        Args:
+            improvement (Improvement): Improvement applied while placing the boxes.
+            layout (Optional[bool]): Keep the placed boxes in `result`, by default
+                STORE_LAYOUT. Without them only the counters and the free spaces
+                are updated.
+            threshold (Optional[int]): Stop before a gene when the upper bound of
+                the value (value_bounds with the volume of the free spaces) is
+                lower than this value. The chromosome is then `dominated` and
+                not evaluated.
+
+        Returns:
+            Chromosome: The evaluated chromosome.
+        """
         if self.evaluated:
             return self
             # raise ValueError("No se puede evaluar un cromosoma ya evaluado")
+        self.dominated = False
+        profiler = Profiler.active
+        if profiler is not None:
+            profiler.start('evaluation')
 
         max_volume = self.container.volume
+        if layout is None:
+            layout = self.STORE_LAYOUT
 
         occupied_vol = 0
         number_boxes = 0
         value = 0
         result: list[Box] = []
-
-        for g_i, gene in enumerate(self.genes):
-            min_pos = Position(99999, 99999, 99999)
-            max_pos = Position(0, 0, 0)
+        start = 0
+
+        # Continuar desde el estado guardado del cromosoma del que se copiaron los primeros genes,
+        # si se necesitan las cajas el cromosoma original debe tenerlas
+        found = self._find_snapshot(improvement) \
+            if self.prefix_source and (not layout or self.prefix_source[0].has_layout) else None
+        if found:
+            start, snapshot = found
+            self.dblf = snapshot.dblf.copy(copy_unused=False)
+            self.dblf.unused = self.dblf.unused[:snapshot.unused_count]
+            self.shared_unused = True
+            occupied_vol = snapshot.occupied_vol
+            number_boxes = snapshot.number_boxes
+            value = snapshot.cost_value
+            if layout:
+                result = self.prefix_source[0].result[:snapshot.result_count]
+            self.improved = snapshot.improved
+            if snapshot.box_number > 0:
+                max_depth = self.genes[start].size.length if start < len(
+                    self.genes) else 0
+                self.dblf.remove_unreachable(
+                    snapshot.min_pos, snapshot.max_pos, max_depth)
+
+        # Guardar snapshots repartidos entre los genes según el presupuesto
+        snapshot_every = 0
+        if self.SNAPSHOT_BUDGET > 0:
+            snapshot_every = max(1, -(-(len(self.genes) - 1) //
+                                      self.SNAPSHOT_BUDGET))
+        self.prefix_source = None
+        self.improvement = improvement
+        self.snapshots = {}
+        # Contadores del profiler
+        start_boxes = number_boxes
+        scans = compactions = 0
+        if threshold is not None:
+            bounds = self.value_bounds(improvement)
+            initial_genes = list(self.genes)
+
+        for g_i in range(start, len(self.genes)):
+            if threshold is not None:
+                # Valor que falta para el umbral, comparado con las dos cotas sin divisiones
+                needed = threshold - value
+                remaining_value, best_value, best_volume = bounds[g_i]
+                if remaining_value < needed or self.dblf.volume * best_value < needed * best_volume:
+                    self.genes[:] = initial_genes
+                    self.dblf = DBLF(
+                        side=[FreeSpace(Position(0, 0, 0), self.container, 'side')])
+                    self.snapshots = {}
+                    self.shared_unused = False
+                    self.improved = False
+                    self.improvement = None
+                    self.fitness_value = None
+                    self.dominated = True
+                    if profiler is not None:
+                        profiler.stop(dominated=1, placements=number_boxes - start_boxes,
+                                      scans=scans, compactions=compactions)
+                    return self
+            gene = self.genes[g_i]
+            # Valores del gen leídos una sola vez
+            size = gene.size
+            length, width, height = size.length, size.width, size.height
+            box_volume = size.volume
+            # Esquinas de las cajas del gen, sin crear posiciones por cada caja
+            min_x = min_y = min_z = 99999
+            max_x = max_y = max_z = 0
             one_type = gene.type
+            box_type = one_type.type
+            box_value = one_type.value_individual
             box_number = 0
+            box_count = gene.box_count
             # logging.debug("Comenzó el tipo %d %s" % (one_type.type, gene.size))
-            while box_number < gene.box_count:
+            while box_number < box_count:
                 box_number += 1
-                available = self.dblf.first_available(gene.size, None)
-                if available:
-                    min_pos = Position(min(min_pos.x, available.position.x),
-                                       min(min_pos.y, available.position.y),
-                                       min(min_pos.z, available.position.z))
-
-                    max_pos = Position(max(max_pos.x, available.position.x + gene.size.length),
-                                       max(max_pos.y, available.position.y +
-                                           gene.size.width),
-                                       max(max_pos.z, available.position.z + gene.size.height))
-
-                    new_box = Box(available.position,
-                                  gene.size, one_type.type)
+                available = self.dblf.first_available(size, None)
+                scans += 1
+                grid = self.dblf.place_grid(available, size, box_type,
+                                            box_count - box_number + 1) \
+                    if available and self.BULK_PLACEMENT and box_number < box_count else None
+                if grid:
+                    nx, ny, nz = grid
+                    x, y, z = available.position.x, available.position.y, available.position.z
+                    min_x, min_y, min_z = min(min_x, x), min(min_y, y), min(min_z, z)
+                    max_x = max(max_x, x + nx * length)
+                    max_y = max(max_y, y + ny * width)
+                    max_z = max(max_z, z + nz * height)
+
+                    if layout:
+                        # Mismo orden que caja a caja: ancho, alto y luego largo
+                        for i in range(nx):
+                            for k in range(nz):
+                                for j in range(ny):
+                                    result.append(Box(Position.unchecked(x + i * length,
+                                                                         y + j * width,
+                                                                         z + k * height),
+                                                      size, box_type))
+                    block_boxes = nx * ny * nz
+                    occupied_vol += block_boxes * box_volume
+                    number_boxes += block_boxes
+                    value += block_boxes * box_value
+                    if value > max_volume:
+                        raise ValueError(
+                            "Se excedió el volumen del contenedor %s" % self)
+                    box_number += block_boxes - 1
+                elif available:
+                    x, y, z = available.position.x, available.position.y, available.position.z
+                    min_x, min_y, min_z = min(min_x, x), min(min_y, y), min(min_z, z)
+                    max_x = max(max_x, x + length)
+                    max_y = max(max_y, y + width)
+                    max_z = max(max_z, z + height)
+
                     # logging.debug("\nnew box (%d): %s" % (box_number, new_box))
-                    occupied_vol += gene.size.volume
+                    occupied_vol += box_volume
                     number_boxes += 1
-                    value += one_type.value_individual
+                    value += box_value
                     if value > max_volume:
                         raise ValueError(
                             "Se excedió el volumen del contenedor %s" % self)
 
-                    result.append(new_box)
+                    if layout:
+                        result.append(Box(available.position,
+                                          size, box_type))
 
                     # Eliminar el espacio usado
                     self.dblf.remove(available)
                     # Añadir los nuevos espacios generados
                     side, top, front = available.split(
-                        gene.size, one_type.type)
+                        size, box_type)
                     self.dblf += DBLF(side=side, top=top, front=front)
                     self.dblf.compact()
+                    compactions += 1
                 else:
                     # logging.debug("No hay espacio disponible para la caja %d %s" %
                     #              (box_number, gene.size))
@@ -138,16 +443,25 @@ Fitness: {self.fitness}"""
 
                 # Mejorar
                 # Si se ha llegado al límite de cajas, intentar aumentar el límite de cajas si queda espacio al lado o encima
-                if improvement.name == 'during' and box_number == gene.box_count and one_type.max_count > box_number:
+                if improvement.name == 'during' and box_number == box_count and one_type.max_count > box_number:
                     self.improved = True
-                    available = DBLF(side=self.dblf.side, top=self.dblf.top).first_available(
-                        gene.size, None)  # No buscar en el frente
+                    available = self.dblf.first_available(
+                        size, None, include_front=False)  # No buscar en el frente
+                    scans += 1
                     if available:  # Si hay espacio disponible seguir añadiendo cajas
                         # logging.debug(
                         #    "Se llegó al número de cajas definido %d, se añadirá una caja más" % box_number)
-                        gene.box_count += 1
+                        box_count += 1
 
-            gene.box_count = box_number  # Actualizar el número de cajas realmente añadidas
+            # Actualizar el número de cajas realmente añadidas
+            self.set_box_count(g_i, box_number)
+            min_pos = Position.unchecked(min_x, min_y, min_z)
+            max_pos = Position.unchecked(max_x, max_y, max_z)
+
+            if snapshot_every and (g_i + 1) % snapshot_every == 0 and g_i + 1 < len(self.genes):
+                self.shared_unused = True
+                self._save_snapshot(g_i + 1, min_pos, max_pos, box_number,
+                                    occupied_vol, number_boxes, value, result)
 
             # logging.debug("Terminó el tipo %d con %d cajas" %
             #              (one_type.type, box_number))
@@ -163,12 +477,83 @@ Fitness: {self.fitness}"""
         self.occupied_vol = occupied_vol
         self.number_boxes = number_boxes
         self.cost_value = value
+        self.fitness_value = None
 
         self.result = result
+        self.has_layout = layout
+        self.decoded_counts = tuple(g.box_count for g in self.genes)
+        self.late_improved = False
         self.evaluated = True
+        if profiler is not None:
+            profiler.stop(evaluations=1, placements=number_boxes - start_boxes,
+                          scans=scans, compactions=compactions)
 
         return self
 
+    def value_bounds(self, improvement: Improvement = Improvement.none) -> list[tuple[int, int, int]]:
+        """
+        Upper bounds of the value added by the genes from each position on.
+
+        The value of the boxes placed from gene `i` is at most the value of
+        all their boxes, the first number of `bounds[i]`. It is also at most
+        the free volume by the highest value per volume of these genes, given
+        as a value and a volume so it is compared without rounding. The boxes
+        are placed in the free spaces, splitting a space keeps the volume not
+        used by the box and joining two spaces keeps their volume, so the
+        volume of the free spaces (DBLF.volume) bounds the volume of the boxes
+        still to place. With equal
+        value per volume, as when the value is the volume, this is the bound
+        of the fractional knapsack. With the `during` improvement a gene may
+        place up to the maximum count of its type.
+
+        Returns:
+            list[tuple[int, int, int]]: (value of the boxes, value, volume) of
+                the genes from every position, the last one for no genes.
+        """
+        bounds = [(0, 0, 1)]
+        remaining_value, best_value, best_volume = bounds[0]
+        for gene in reversed(self.genes):
+            one_type = gene.type
+            box_count = gene.box_count
+            if improvement == Improvement.during:
+                box_count = max(box_count, one_type.max_count)
+            if box_count > 0:
+                remaining_value += box_count * one_type.value_individual
+                if one_type.value_individual * best_volume > best_value * gene.size.volume:
+                    best_value, best_volume = one_type.value_individual, gene.size.volume
+            bounds.append((remaining_value, best_value, best_volume))
+        bounds.reverse()
+        return bounds
+
+    def materialize_layout(self) -> list[Box]:
+        """
+        Return the boxes of the evaluated chromosome.
+
+        If it was evaluated without them, the genes are decoded again with the
+        box counts and the improvement of the evaluation, and the late
+        improvement if it was applied.
+
+        Returns:
+            list[Box]: The placed boxes, also kept in `result`.
+        """
+        if not self.evaluated:
+            raise ValueError("No se puede obtener las cajas de un cromosoma no evaluado")
+        if self.has_layout:
+            return self.result
+        decoded = Chromosome([gene.with_box_count(box_count)
+                              for gene, box_count in zip(self.genes, self.decoded_counts)],
+                             self.container)
+        decoded.evaluate(self.improvement or Improvement.none, layout=True)
+        if self.late_improved:
+            decoded.evaluate_with_improvement_late()
+        if decoded.fitness != self.fitness:
+            raise ValueError(
+                "Las cajas decodificadas no corresponden al fitness %s %s" % (self.fitness, decoded.fitness))
+        self.result = decoded.result
+        self.shared_result = False
+        self.has_layout = True
+        return self.result
+
     def get_dblf_from_unused(self) -> DBLF:
         top_group = list(
             filter(lambda x: x.group == 'top', self.dblf.unused))
@@ -184,19 +569,39 @@ Fitness: {self.fitness}"""
     def evaluate_with_improvement_late(self) -> 'Chromosome':
         if not self.evaluated:
             raise ValueError("No se puede mejorar un cromosoma no evaluado")
+        if self.restored and self.late_improved:
+            return self
+        profiler = Profiler.active
+        if profiler is not None:
+            profiler.start('late_improvement')
+        start_boxes = self.number_boxes
+        scans = compactions = 0
+        if self.restored:
+            # No hay espacios libres, repetir la evaluación con las cajas ya calculadas
+            self.evaluated = False
+            self.restored = False
+            self.dblf = DBLF(
+                side=[FreeSpace(Position(0, 0, 0), self.container, 'side')])
+            self.evaluate(self.improvement)
         max_volume = self.container.volume
         if len(self.dblf.unused) > 0:
+            if self.shared_unused:
+                self.dblf.unused = [copy_space(s) for s in self.dblf.unused]
+                self.shared_unused = False
+            if self.shared_result:
+                self.result = list(self.result)
+                self.shared_result = False
             new_dblf = self.get_dblf_from_unused()
             last_value = self.get_fitness
             for g_i, gene in enumerate(self.genes):
                 one_type = gene.type
-                while gene.box_count < one_type.max_count:
+                box_count = gene.box_count
+                while box_count < one_type.max_count:
                     available = new_dblf.first_available(gene.size,
                                                          one_type.type)
+                    scans += 1
                     if available:
-                        gene.box_count += 1
-                        new_box = Box(available.position,
-                                      gene.size, one_type.type)
+                        box_count += 1
                         self.occupied_vol += gene.size.volume
                         self.number_boxes += 1
                         self.cost_value += one_type.value_individual
@@ -204,7 +609,9 @@ Fitness: {self.fitness}"""
                             raise ValueError(
                                 "Se excedió el volumen del contenedor %s" % self)
 
-                        self.result.append(new_box)
+                        if self.has_layout:
+                            self.result.append(Box(available.position,
+                                                   gene.size, one_type.type))
 
                         # Eliminar el espacio usado
                         new_dblf.remove(available)
@@ -213,8 +620,11 @@ Fitness: {self.fitness}"""
                                                            one_type.type)
                         new_dblf += DBLF(side=side, top=top, front=front)
                         new_dblf.compact()
+                        compactions += 1
                     else:
                         break
+                self.set_box_count(g_i, box_count)
+            self.fitness_value = None
 
             new_value = self.get_fitness
             if new_value < last_value:
@@ -222,21 +632,29 @@ Fitness: {self.fitness}"""
                     "El valor mejorado es peor que el anterior %s %s" % (last_value, new_value))
 
             self.improved = True
+            self.late_improved = True
 
+        if profiler is not None:
+            profiler.stop(late_improvements=1, placements=self.number_boxes - start_boxes,
+                          scans=scans, compactions=compactions)
         return self
 
     def __matmul__(self, other: 'Chromosome') -> tuple['Chromosome', 'Chromosome']:
         return self.crossover(other)
 
     def crossover_one_point(self, other: 'Chromosome', point) -> 'Chromosome':
-        genes = [copy(g) for g in self.genes[:point]]
+        # Los genes se comparten, el hijo los reemplaza al cambiarlos
+        genes = self.genes[:point]
         current_types = [g.type.type for g in genes]
         for o in other.genes:
             if o.type.type not in current_types:
-                genes.append(copy(o))
+                genes.append(o)
         if (len(genes) != len(self.genes)):
             raise ValueError("Error en el conteo de genes en el crossover")
-        return Chromosome(genes, self.container)
+        child = Chromosome(genes, self.container)
+        if self.snapshots:
+            child.prefix_source = (self, point)
+        return child
 
     def crossover(self, other: 'Chromosome') -> tuple['Chromosome', 'Chromosome']:
         crossover_point = random.randint(1, len(self.genes) - 1)
@@ -248,7 +666,8 @@ Fitness: {self.fitness}"""
 
     def mutate(self) -> tuple[list[int], 'Chromosome']:
         mutated = [0, 0, 0]
-        new_genes = [copy(g) for g in self.genes]
+        # Solo se copia el gen que se modifica
+        new_genes = list(self.genes)
         type_mutation = random.choice(['interchange', 'count', 'rotation'])
         if type_mutation == 'interchange':
             # Intercambiar dos genes
@@ -256,12 +675,12 @@ Fitness: {self.fitness}"""
             new_genes[i], new_genes[j] = new_genes[j], new_genes[i]
             mutated[0] += 1
         elif type_mutation == 'count':
-            gene = random.choice(new_genes)
-            gene.mutate_quantity(0.1)
+            i = random.randrange(len(new_genes))
+            new_genes[i] = copy(new_genes[i]).mutate_quantity(0.1)
             mutated[1] += 1
         elif type_mutation == 'rotation':
-            gene = random.choice(new_genes)
-            gene.mutate_rotation()
+            i = random.randrange(len(new_genes))
+            new_genes[i] = copy(new_genes[i]).mutate_rotation()
             mutated[2] += 1
 
         # Verificar si todos los tipos están presentes
@@ -271,6 +690,10 @@ Fitness: {self.fitness}"""
 
         # Si se mutó, reiniciar el fitness para recalcularlo
         if sum(mutated) > 0:
-            return mutated, Chromosome(new_genes, self.container)
+            mutant = Chromosome(new_genes, self.container)
+            if self.snapshots:
+                # Los genes previos al primer cambio se comprueban al evaluar
+                mutant.prefix_source = (self, len(new_genes))
+            return mutated, mutant
         else:
             return mutated, self
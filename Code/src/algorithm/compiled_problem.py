@@ -0,0 +1,46 @@
+from dataclasses import dataclass
+
+from lcp.src.problems import Problem
+from .gene import Gene
+from .chromosome import Chromosome
+
+Genotype = tuple[tuple[int, int, int], ...]
+
+
+@dataclass
+class CompiledProblem:
+    """
+    Index of the box types of a problem, built once and shared by all its evaluations.
+
+    Each box type has an index, its position in `problem.box_types`. Genotypes
+    of (type, box_count, rotation) are rebuilt into genes with it, in the
+    pool workers, the islands and the checkpoints.
+
+    Attributes:
+        problem (Problem): The compiled problem.
+        index (dict[int, int]): Index of each box type by its type number.
+        min_counts (list[int]): Minimum number of boxes of each type.
+        max_counts (list[int]): Maximum number of boxes of each type.
+    """
+    problem: Problem
+    index: dict[int, int]
+    min_counts: list[int]
+    max_counts: list[int]
+
+    @staticmethod
+    def compile(problem: Problem) -> 'CompiledProblem':
+        box_types = problem.box_types
+        return CompiledProblem(
+            problem,
+            {t.type: i for i, t in enumerate(box_types)},
+            [t.min_count for t in box_types],
+            [t.max_count for t in box_types])
+
+    def genes(self, genotype: Genotype) -> list[Gene]:
+        """Build the genes of a genotype, (type, box_count, rotation) of every gene"""
+        box_types = self.problem.box_types
+        return [Gene(box_types[self.index[t]], box_count, rotation)
+                for t, box_count, rotation in genotype]
+
+    def chromosome(self, genotype: Genotype) -> Chromosome:
+        return Chromosome(self.genes(genotype), self.problem.container)
@@ -1,21 +1,44 @@
+from bisect import insort
 from copy import deepcopy
 from dataclasses import dataclass, field
 from itertools import chain
 import logging
-from typing import Iterator, Optional
+from typing import ClassVar, Iterator, Optional, Union
 
 from lcp.src.location import Size, Position
 from lcp.src.container import FreeSpace
+from .free_space_store import FreeSpaceStore
+from .free_space_index import FreeSpaceIndex
+
+
+def copy_space(space: FreeSpace) -> FreeSpace:
+    """Copy a free space without sharing its position or size"""
+    size = Size(space.size.length, space.size.width, space.size.height)
+    # Conservar el volumen guardado, que no se actualiza al unir espacios
+    size.volume = space.size.volume
+    return FreeSpace(Position.unchecked(space.position.x, space.position.y, space.position.z),
+                     size, space.group, space.type)
 
 
 @dataclass
 class DBLF:
+    # Estructura usada para buscar espacios: 'list' recorre las listas,
+    # 'array' usa un FreeSpaceStore con búsqueda vectorizada y 'bucket' un
+    # FreeSpaceIndex agrupado por dimensiones
+    BACKEND: ClassVar[str] = 'list'
+    # Desde cuántos espacios compact usa índices en lugar de recorrer los anteriores
+    COMPACT_INDEX_MIN: ClassVar[int] = 32
+
     side: list[FreeSpace] = field(default_factory=list)
     top: list[FreeSpace] = field(default_factory=list)
     front: list[FreeSpace] = field(default_factory=list)
     MAX_DEPTH_ALLOWED: int = field(default=600, repr=False)
     unused: list[FreeSpace] = field(
         default_factory=list, init=False, repr=False)
+    backend: str = field(default_factory=lambda: DBLF.BACKEND,
+                         repr=False, compare=False)
+    _store: Optional[Union[FreeSpaceStore, FreeSpaceIndex]] = field(
+        default=None, init=False, repr=False, compare=False)
 
     def __iter__(self) -> Iterator[FreeSpace]:
         return chain(self.side, self.top, self.front)
@@ -31,21 +54,67 @@ class DBLF:
             return self.front[index]
         raise IndexError("Index out of range")
 
-    def first_available(self, box_size: Size, type: Optional[int]) -> Optional[FreeSpace]:
-        for space in self:
+    @property
+    def volume(self) -> int:
+        """Sum of the volumes of the free spaces, from their sizes since the saved volume is not updated when they change"""
+        return sum(space.size.length * space.size.width * space.size.height for space in self)
+
+    @property
+    def store(self) -> Union[FreeSpaceStore, FreeSpaceIndex]:
+        """Search structure of the backend, built on first use and kept in sync"""
+        if self._store is None:
+            if self.backend == 'bucket':
+                self._store = FreeSpaceIndex()
+            else:
+                self._store = FreeSpaceStore(max(32, 2 * len(self)))
+            for group, spaces in enumerate((self.side, self.top, self.front)):
+                for space in spaces:
+                    self._store.add(space, group)
+        return self._store
+
+    def first_available(self, box_size: Size, type: Optional[int], include_front: bool = True) -> Optional[FreeSpace]:
+        if self.backend != 'list':
+            return self.store.first_fit(box_size, type, include_front)
+        spaces = self if include_front else chain(self.side, self.top)
+        for space in spaces:
             if space.size >= box_size and ((space.type is None) or (type is None) or (space.type == type)):
                 return space
         return None
 
+    def _update(self, space: FreeSpace):
+        if self._store is not None:
+            self._store.update(space)
+
+    def _delete(self, spaces: list[FreeSpace], index: int):
+        if self._store is not None:
+            self._store.remove(spaces[index])
+        del spaces[index]
+
     def remove(self, space: FreeSpace):
-        if space in self.side:
-            self.side.remove(space)
-        elif space in self.top:
-            self.top.remove(space)
-        elif space in self.front:
-            self.front.remove(space)
+        for spaces in (self.side, self.top, self.front):
+            try:
+                index = spaces.index(space)
+            except ValueError:
+                continue
+            self._delete(spaces, index)
+            return
+
+    def copy(self, copy_unused: bool = True) -> 'DBLF':
+        """Copy the DBLF and its free spaces, the unused list is shared if copy_unused is False"""
+        new_dblf = DBLF(side=[copy_space(s) for s in self.side],
+                        top=[copy_space(s) for s in self.top],
+                        front=[copy_space(s) for s in self.front],
+                        MAX_DEPTH_ALLOWED=self.MAX_DEPTH_ALLOWED,
+                        backend=self.backend)
+        new_dblf.unused = [copy_space(s) for s in self.unused] \
+            if copy_unused else self.unused
+        return new_dblf
 
     def __iadd__(self, other: 'DBLF') -> 'DBLF':
+        if self._store is not None:
+            for group, spaces in enumerate((other.side, other.top, other.front)):
+                for space in spaces:
+                    self._store.add(space, group)
         self.side.extend(other.side)
         self.top.extend(other.top)
         self.front.extend(other.front)
@@ -69,9 +138,10 @@ class DBLF:
                     self.unused.append(old_space)
                     space.size.width -= max_pos.y - space.position.y
                     space.position.y = max_pos.y
+                    self._update(space)
                 else:
                     self.unused.append(deepcopy(space))
-                    del self.side[i]
+                    self._delete(self.side, i)
                 changed = True
 
         for i in reversed(range(len(self.top))):
@@ -83,7 +153,7 @@ class DBLF:
                 # logging.debug("Caso raro: evaluar")
                 # logging.debug("Modificar espacio top no accesible %s" % space)
                 self.unused.append(deepcopy(space))
-                del self.top[i]
+                self._delete(self.top, i)
                 changed = True
 
         for i in reversed(range(len(self.front))):
@@ -92,7 +162,7 @@ class DBLF:
                 # logging.debug(
                 #    "Modificar espacio front no accesible %s" % space)
                 self.unused.append(deepcopy(space))
-                del self.front[i]
+                self._delete(self.front, i)
                 changed = True
 
         if changed:
@@ -117,6 +187,7 @@ class DBLF:
                 # Cortar el nuevo espacio
                 space.position.x += space.size.length - max_depth
                 space.size.length = max_depth
+                self._update(space)
 
             elif space.position.x + space.size.length < max_pos.x:
                 # logging.debug("Eliminando espacio muy profundo %s" % space)
@@ -125,9 +196,183 @@ class DBLF:
 
         return self
 
+    @staticmethod
+    def can_merge(prev: FreeSpace, following: FreeSpace) -> bool:
+        """Check if compact would join the two spaces"""
+        return (prev.position.x == following.position.x and
+                prev.position.y == following.position.y and
+                prev.size.length == following.size.length and
+                prev.size.width == following.size.width) or \
+            (prev.position.y == following.position.y and
+             prev.position.z == following.position.z and
+             prev.size.width == following.size.width and
+             prev.size.height == following.size.height) or \
+            (prev.position.x == following.position.x and
+             prev.position.z == following.position.z and
+             prev.size.length == following.size.length and
+             prev.size.height == following.size.height)
+
+    def place_grid(self, space: FreeSpace, box_size: Size, box_type: int, max_boxes: int) -> Optional[tuple[int, int, int]]:
+        """
+        Place a block of identical boxes in the space in a single step.
+
+        Boxes are placed one by one filling the width first, then the height
+        and then the length of the space, so a block of nx complete slabs of
+        ny x nz boxes leaves only three spaces: a side strip, the top of the
+        block and the front of the space. The block is only placed when no
+        other space can receive a box or be joined to the pieces created box
+        by box, so the result is the same as placing the boxes one by one.
+
+        Args:
+            space (FreeSpace): The first available space for the box.
+            box_size (Size): The size of every box.
+            box_type (int): The type of the boxes.
+            max_boxes (int): The maximum number of boxes to place.
+
+        Returns:
+            Optional[tuple[int, int, int]]: The number of boxes placed along
+                the length, width and height, or None if the block was not placed.
+        """
+        l, w, h = box_size.length, box_size.width, box_size.height
+        x, y, z = space.position.x, space.position.y, space.position.z
+        length, width, height = space.size.length, space.size.width, space.size.height
+        ny, nz = width // w, height // h
+        if ny == 0 or nz == 0:
+            return None
+        nx = min(length // l, max_boxes // (ny * nz))
+        if nx * ny * nz < 2:
+            return None
+
+        others = [other for other in self if other is not space]
+        for other in others:
+            if other.size >= box_size:
+                return None
+            # Los espacios creados caja a caja tienen coordenadas en la rejilla,
+            # solo se pueden unir con otro que comparta dos de ellas
+            dx, dy, dz = other.position.x - x, other.position.y - y, other.position.z - z
+            shared = (dx >= 0 and dx % l == 0 and dx // l <= nx) + \
+                (dy >= 0 and dy % w == 0 and dy // w <= ny) + \
+                (dz >= 0 and dz % h == 0 and dz // h <= nz)
+            if shared >= 2:
+                return None
+        for i in range(len(others)):
+            for j in range(i):
+                if self.can_merge(others[j], others[i]):
+                    return None
+
+        self.remove(space)
+        side, top, front = [], [], []
+        # Los espacios unidos conservan el volumen del primer espacio creado
+        if width > ny * w:
+            side_space = FreeSpace(Position.unchecked(x, y + ny * w, z),
+                                   Size(nx * l, width - ny * w, height), 'side', box_type)
+            side_space.size.volume = l * (width - ny * w) * height
+            side.append(side_space)
+        if height > nz * h:
+            top_space = FreeSpace(Position.unchecked(x, y, z + nz * h),
+                                  Size(nx * l, ny * w, height - nz * h), 'top', box_type)
+            top_space.size.volume = l * w * (height - nz * h)
+            top.append(top_space)
+        if length > nx * l:
+            front.append(FreeSpace(Position.unchecked(x + nx * l, y, z),
+                                   Size(length - nx * l, width, height), 'front', box_type))
+        self += DBLF(side=side, top=top, front=front)
+        return nx, ny, nz
+
     def compact(self) -> 'DBLF':
+        """
+        Join the free spaces that share a face, with the same result as compact_pairwise.
+
+        Each space is joined to the closest previous space that matches one of
+        the merge conditions. The coordinates are read once into flat lists
+        and, when there are many spaces, indexed by the values each condition
+        compares, so the candidate is the last index of three buckets instead
+        of a scan over every previous space.
+        """
+        spaces = list(self)
+        n = len(spaces)
+        if n < 2:
+            return self
+        side_count, top_count = len(self.side), len(self.top)
+        X = [s.position.x for s in spaces]
+        Y = [s.position.y for s in spaces]
+        Z = [s.position.z for s in spaces]
+        L = [s.size.length for s in spaces]
+        W = [s.size.width for s in spaces]
+        H = [s.size.height for s in spaces]
+
+        def merge_keys(k: int) -> tuple[tuple, tuple, tuple]:
+            return (0, X[k], Y[k], L[k], W[k]), (1, Y[k], Z[k], W[k], H[k]), (2, X[k], Z[k], L[k], H[k])
+
+        # Índices ordenados de los espacios según las claves de cada condición
+        buckets: Optional[dict[tuple, list[int]]] = None
+        if n > self.COMPACT_INDEX_MIN:
+            buckets = {}
+            for k in range(n):
+                for key in merge_keys(k):
+                    buckets.setdefault(key, []).append(k)
+
+        for i in range(n-1, 0, -1):
+            x, y, z, l, w, h = X[i], Y[i], Z[i], L[i], W[i], H[i]
+            if buckets is None:
+                j = i - 1
+                while j >= 0 and not (
+                        (X[j] == x and Y[j] == y and L[j] == l and W[j] == w) or
+                        (Y[j] == y and Z[j] == z and W[j] == w and H[j] == h) or
+                        (X[j] == x and Z[j] == z and L[j] == l and H[j] == h)):
+                    j -= 1
+            else:
+                # El espacio actual ya no puede ser el anterior de ningún otro
+                keys = merge_keys(i)
+                for key in keys:
+                    buckets[key].pop()
+                j = max((buckets[key][-1] for key in keys if buckets[key]),
+                        default=-1)
+            if j < 0:
+                continue
+
+            side_prev, side_next = spaces[j], spaces[i]
+            old_keys = merge_keys(j) if buckets is not None else ()
+            if X[j] == x and Y[j] == y and L[j] == l and W[j] == w:
+                side_prev.size.height += h
+                H[j] = side_prev.size.height
+            elif Y[j] == y and Z[j] == z and W[j] == w and H[j] == h:
+                side_prev.size.length += l
+                L[j] = side_prev.size.length
+            else:
+                side_prev.size.width += w
+                W[j] = side_prev.size.width
+            self._update(side_prev)
+            if buckets is not None:
+                for old_key, new_key in zip(old_keys, merge_keys(j)):
+                    if old_key != new_key:
+                        buckets[old_key].remove(j)
+                        insort(buckets.setdefault(new_key, []), j)
+
+            for k in range(i):
+                if X[k] == x and Y[k] == y and Z[k] == z and L[k] == l and W[k] == w and H[k] == h and \
+                        spaces[k].group == side_next.group and spaces[k].type == side_next.type:
+                    # remove quitaría el primer espacio igual y no el actual,
+                    # seguir comparando todos los pares como antes
+                    self.remove(side_next)
+                    return self.compact_pairwise(i - 1)
+
+            # Los espacios anteriores al actual no cambian de posición
+            if i < side_count:
+                self._delete(self.side, i)
+            elif i < side_count + top_count:
+                self._delete(self.top, i - side_count)
+            else:
+                self._delete(self.front, i - side_count - top_count)
+
+        return self
+
+    def compact_pairwise(self, start: Optional[int] = None) -> 'DBLF':
+        """Join the free spaces comparing every pair, starting from the space at `start`"""
+        if start is None:
+            start = len(self)-1
         # Unir los espacios de los lados si son contiguos y dimensiones similares
-        for i in range(len(self)-1, 0, -1):
+        for i in range(start, 0, -1):
             side_next = self[i]
             for j in range(i-1, -1, -1):
                 side_prev = self[j]
@@ -136,6 +381,7 @@ class DBLF:
                         side_prev.size.length == side_next.size.length and \
                         side_prev.size.width == side_next.size.width:
                     side_prev.size.height += side_next.size.height
+                    self._update(side_prev)
                     # logging.debug("Eliminando side vertical %s" % side_next)
                     self.remove(side_next)
                     break
@@ -144,6 +390,7 @@ class DBLF:
                         side_prev.size.width == side_next.size.width and \
                         side_prev.size.height == side_next.size.height:
                     side_prev.size.length += side_next.size.length
+                    self._update(side_prev)
                     # logging.debug("Eliminando side horizontal %s" % side_next)
                     self.remove(side_next)
                     break
@@ -152,6 +399,7 @@ class DBLF:
                         side_prev.size.length == side_next.size.length and \
                         side_prev.size.height == side_next.size.height:
                     side_prev.size.width += side_next.size.width
+                    self._update(side_prev)
                     # logging.debug("Eliminando top horizontal %s" % side_next)
                     self.remove(side_next)
                     break
@@ -160,6 +408,7 @@ class DBLF:
                         side_prev.size.width == side_next.size.width and \
                         side_prev.size.height == side_next.size.height:
                     side_prev.size.length += side_next.size.length
+                    self._update(side_prev)
                     # logging.debug("Eliminando top vertical %s" % side_next)
                     self.remove(side_next)
                     break
@@ -168,6 +417,7 @@ class DBLF:
                         side_prev.size.width == side_next.size.width and \
                         side_prev.size.height == side_next.size.height:
                     side_prev.size.length += side_next.size.length
+                    self._update(side_prev)
                     # logging.debug("Eliminando front horizontal %s" % side_next)
                     self.remove(side_next)
                     break
@@ -176,6 +426,7 @@ class DBLF:
                         side_prev.size.length == side_next.size.length and \
                         side_prev.size.height == side_next.size.height:
                     side_prev.size.width += side_next.size.width
+                    self._update(side_prev)
                     # logging.debug("Eliminando front vertical %s" % side_next)
                     self.remove(side_next)
                     break
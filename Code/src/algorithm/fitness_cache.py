@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from lcp.src.container import Box
+from .chromosome import Chromosome, Improvement
+
+
+@dataclass
+class CacheEntry:
+    """
+    Result of evaluating a genotype.
+
+    Attributes:
+        box_counts (tuple[int, ...]): Boxes actually placed for each gene.
+        result (Optional[list[Box]]): The layout, only if the cache stores layouts.
+    """
+    box_counts: tuple[int, ...]
+    occupied_vol: int
+    number_boxes: int
+    cost_value: int
+    improved: bool
+    result: Optional[list[Box]] = None
+
+    @staticmethod
+    def from_chromosome(chromosome: Chromosome, store_layout: bool = False) -> 'CacheEntry':
+        return CacheEntry(tuple(g.box_count for g in chromosome.genes),
+                          chromosome.occupied_vol,
+                          chromosome.number_boxes,
+                          chromosome.cost_value,
+                          chromosome.improved,
+                          list(chromosome.result) if store_layout and chromosome.has_layout else None)
+
+
+class FitnessCache:
+    """
+    Size-bounded LRU cache of evaluations keyed by genotype.
+
+    The key is the improvement used to evaluate, the ordered
+    (type, box_count, rotation) of every gene before the evaluation and
+    whether the result includes the late improvement. The late improvement
+    starts from the boxes placed by the evaluation, so its key has the box
+    counts after the evaluation.
+
+    Attributes:
+        maxsize (int): Maximum number of entries, the least recently used is evicted.
+        store_layout (bool): Keep the list of boxes of every entry.
+    """
+
+    def __init__(self, maxsize: int = 10000, store_layout: bool = False):
+        self.maxsize = maxsize
+        self.store_layout = store_layout
+        self.entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def key(chromosome: Chromosome, improvement: Improvement, late: bool = False) -> tuple:
+        return improvement.name, chromosome.genotype, late
+
+    @staticmethod
+    def late_key(key: tuple, entry: CacheEntry) -> tuple:
+        """Key of the late improvement of `entry`, the result of the evaluation with `key`"""
+        improvement, genotype, _ = key
+        return improvement, tuple((t, box_count, rotation)
+                                  for (t, _, rotation), box_count in zip(genotype, entry.box_counts)), True
+
+    def get(self, key: tuple) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, chromosome: Chromosome) -> CacheEntry:
+        return self.add(key, CacheEntry.from_chromosome(chromosome, self.store_layout))
+
+    def add(self, key: tuple, entry: CacheEntry) -> CacheEntry:
+        if not self.store_layout and entry.result is not None:
+            entry = replace(entry, result=None)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
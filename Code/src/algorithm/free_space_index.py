@@ -0,0 +1,80 @@
+from bisect import bisect_left, insort
+from typing import Optional
+
+from lcp.src.location import Size
+from lcp.src.container import FreeSpace
+from .free_space_store import GROUP_SHIFT, FRONT_KEY
+
+
+def bucket_key(length: int, width: int, height: int) -> tuple[int, int, int]:
+    """Bucket of a size: the number of bits of each dimension"""
+    return length.bit_length(), width.bit_length(), height.bit_length()
+
+
+class FreeSpaceIndex:
+    """
+    Index of the free spaces of a DBLF grouped in dimension buckets.
+
+    A space is stored in the bucket given by the bit length of its length,
+    width and height. A box can only fit in buckets whose three keys are not
+    smaller than the keys of the box, so the other buckets are skipped.
+    Inside each bucket the spaces are sorted by their order key (group rank
+    and insertion sequence) to return the first feasible space in DBLF order.
+    """
+
+    def __init__(self):
+        self.sequence = 0
+        self.buckets: dict[tuple[int, int, int], list[tuple[int, FreeSpace]]] = {}
+        self.entries: dict[int, tuple[tuple[int, int, int], int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _insert(self, space: FreeSpace, order: int):
+        key = bucket_key(space.size.length,
+                         space.size.width, space.size.height)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = []
+        # El id desempata y evita comparar los espacios
+        insort(bucket, (order, id(space), space))
+        self.entries[id(space)] = (key, order)
+
+    def _discard(self, space: FreeSpace) -> int:
+        key, order = self.entries.pop(id(space))
+        bucket = self.buckets[key]
+        del bucket[bisect_left(bucket, (order, id(space)))]
+        if not bucket:
+            del self.buckets[key]
+        return order
+
+    def add(self, space: FreeSpace, group: int):
+        """Append a space at the end of the group (0: side, 1: top, 2: front)"""
+        self._insert(space, (group << GROUP_SHIFT) | self.sequence)
+        self.sequence += 1
+
+    def update(self, space: FreeSpace):
+        """Move a space whose size changed in place to its new bucket"""
+        key, _ = self.entries[id(space)]
+        if key != bucket_key(space.size.length, space.size.width, space.size.height):
+            self._insert(space, self._discard(space))
+
+    def remove(self, space: FreeSpace):
+        self._discard(space)
+
+    def first_fit(self, box_size: Size, type: Optional[int], include_front: bool = True) -> Optional[FreeSpace]:
+        """Return the first space in DBLF order where the box fits"""
+        min_l, min_w, min_h = bucket_key(box_size.length,
+                                         box_size.width, box_size.height)
+        best_order = FRONT_KEY if not include_front else None
+        best = None
+        for (l, w, h), bucket in self.buckets.items():
+            if l < min_l or w < min_w or h < min_h:
+                continue
+            for order, _, space in bucket:
+                if best_order is not None and order >= best_order:
+                    break
+                if space.size >= box_size and ((space.type is None) or (type is None) or (space.type == type)):
+                    best_order, best = order, space
+                    break
+        return best
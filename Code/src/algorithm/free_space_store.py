@@ -0,0 +1,116 @@
+from typing import Optional
+
+import numpy as np
+
+from lcp.src.location import Size
+from lcp.src.container import FreeSpace
+
+# Rango de cada grupo dentro del orden DBLF: side, top y luego front
+GROUP_SHIFT = 40
+FRONT_KEY = 2 << GROUP_SHIFT
+NO_TYPE = -1
+
+
+class FreeSpaceStore:
+    """
+    Structure-of-arrays copy of the free spaces of a DBLF.
+
+    Each row keeps the coordinates, the size, the type and the group of a
+    free space plus an order key (group rank and insertion sequence), so the
+    first space that fits a box in DBLF order can be found with a single
+    vectorized query instead of walking the lists.
+
+    Attributes:
+        spaces (list[FreeSpace]): The free space stored in each row.
+    """
+
+    def __init__(self, capacity: int = 32):
+        self.size = 0
+        self.sequence = 0
+        self.spaces: list[FreeSpace] = []
+        self.rows: dict[int, int] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        def grow(column: Optional[np.ndarray]) -> np.ndarray:
+            new_column = np.empty(capacity, dtype=np.int64)
+            if column is not None:
+                new_column[:self.size] = column[:self.size]
+            return new_column
+
+        self.x = grow(getattr(self, 'x', None))
+        self.y = grow(getattr(self, 'y', None))
+        self.z = grow(getattr(self, 'z', None))
+        self.l = grow(getattr(self, 'l', None))
+        self.w = grow(getattr(self, 'w', None))
+        self.h = grow(getattr(self, 'h', None))
+        self.volume = grow(getattr(self, 'volume', None))
+        self.type = grow(getattr(self, 'type', None))
+        self.group = grow(getattr(self, 'group', None))
+        self.order = grow(getattr(self, 'order', None))
+        self.capacity = capacity
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _write(self, row: int, space: FreeSpace):
+        self.x[row] = space.position.x
+        self.y[row] = space.position.y
+        self.z[row] = space.position.z
+        self.l[row] = space.size.length
+        self.w[row] = space.size.width
+        self.h[row] = space.size.height
+        # Se usa el volumen guardado en el espacio, igual que Size.__ge__
+        self.volume[row] = space.size.volume
+        self.type[row] = NO_TYPE if space.type is None else space.type
+
+    def add(self, space: FreeSpace, group: int):
+        """Append a space at the end of the group (0: side, 1: top, 2: front)"""
+        if self.size == self.capacity:
+            self._allocate(self.capacity * 2)
+        row = self.size
+        self._write(row, space)
+        self.group[row] = group
+        self.order[row] = (group << GROUP_SHIFT) | self.sequence
+        self.sequence += 1
+        self.spaces.append(space)
+        self.rows[id(space)] = row
+        self.size += 1
+
+    def update(self, space: FreeSpace):
+        """Refresh the row of a space whose position or size changed in place"""
+        self._write(self.rows[id(space)], space)
+
+    def remove(self, space: FreeSpace):
+        row = self.rows.pop(id(space))
+        last = self.size - 1
+        if row != last:
+            # Mover la última fila al hueco, el orden lo mantiene la clave
+            for column in (self.x, self.y, self.z, self.l, self.w, self.h,
+                           self.volume, self.type, self.group, self.order):
+                column[row] = column[last]
+            moved = self.spaces[last]
+            self.spaces[row] = moved
+            self.rows[id(moved)] = row
+        self.spaces.pop()
+        self.size = last
+
+    def first_fit(self, box_size: Size, type: Optional[int], include_front: bool = True) -> Optional[FreeSpace]:
+        """Return the first space in DBLF order where the box fits"""
+        n = self.size
+        if n == 0:
+            return None
+        mask = (self.l[:n] >= box_size.length) & \
+            (self.w[:n] >= box_size.width) & \
+            (self.h[:n] >= box_size.height) & \
+            (self.volume[:n] >= box_size.volume)
+        if type is not None:
+            types = self.type[:n]
+            mask &= (types == NO_TYPE) | (types == type)
+        if not include_front:
+            mask &= self.order[:n] < FRONT_KEY
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return None
+        best = candidates[np.argmin(self.order[:n][candidates])]
+        return self.spaces[best]
@@ -14,7 +14,8 @@ class Gene:
         type (BoxType): The type of the gene.
         box_count (int): The number of boxes of this gene.
         rotation (int): The type of rotation of the box type.
-        size (Size): The size of the gene after rotation if any.
+        size (Size): The size of the gene after rotation if any, shared with
+            the other genes of the same type and rotation.
     """
     type: BoxType
     box_count: int
@@ -32,16 +33,30 @@ class Gene:
         """
         Initializes the size attribute based on the rotation and type of the gene.
         """
-        if self.rotation == 0:
-            self.size = Size(self.type.length,
-                             self.type.width, self.type.height)
-        else:
-            self.size = Size(self.type.width,
-                             self.type.length, self.type.height)
+        self.size = self.type.rotations[0 if self.rotation == 0 else 1]
 
     def __copy__(self) -> 'Gene':
         return Gene(self.type, self.box_count, self.rotation)
 
+    def with_box_count(self, box_count: int) -> 'Gene':
+        """
+        Returns a copy of the gene with another number of boxes.
+
+        The size is shared with this gene.
+
+        Args:
+            box_count (int): The number of boxes of the new gene.
+
+        Returns:
+            Gene: The new gene.
+        """
+        new_gene = Gene.__new__(Gene)
+        new_gene.type = self.type
+        new_gene.box_count = box_count
+        new_gene.rotation = self.rotation
+        new_gene.size = self.size
+        return new_gene
+
     def mutate_quantity(self, variation: float = 0.1) -> 'Gene':
         """
         Mutates the box count of the gene by a random percentage.
@@ -71,5 +86,5 @@ class Gene:
             Gene: The mutated gene.
         """
         self.rotation = 1 - self.rotation
-        self.size.length, self.size.width = self.size.width, self.size.length
+        self.size = self.type.rotations[self.rotation]
         return self
@@ -1,10 +1,20 @@
-from copy import deepcopy
 import random
 import sys
 import time
 from typing import Callable, Optional
 from dataclasses import dataclass, field
-from .population import Population
+
+import numpy as np
+
+from lcp.src.problems import ProblemBounds
+from .checkpoint import Checkpoint, SavedChromosome
+from .chromosome import Chromosome
+from .compiled_problem import CompiledProblem
+from .fitness_cache import FitnessCache
+from .parallel import ParallelEvaluator
+from .population import GroupImprovement, Population
+from .population_arrays import PopulationArrays, tournament
+from .profiler import Profiler, phase
 
 inf = sys.maxsize
 
@@ -22,8 +32,52 @@ class GeneticAlgorithm:
     MAX_GENERATIONS: int = field(default=inf)
     STOP_UNIMPROVED: int = field(default=inf)
     MAX_DURATION: int = field(default=inf)
+    # Terminar cuando la diferencia entre el mejor valor y la cota superior del problema
+    # (ProblemBounds), relativa a la cota, llega a STOP_GAP; con 0 solo al alcanzar la cota
+    STOP_GAP: float = field(default=0.)
+    # Registrar el tiempo de cada fase y los contadores de cada generación en stats['profile'],
+    # la fase 'generation' es el tiempo que no está en las demás
+    PROFILE: bool = field(default=False)
+    # Guardar el estado en CHECKPOINT_PATH cada CHECKPOINT_GENERATIONS generaciones o
+    # CHECKPOINT_SECONDS segundos, se continúa con resume
+    CHECKPOINT_PATH: Optional[str] = field(default=None)
+    CHECKPOINT_GENERATIONS: int = field(default=inf)
+    CHECKPOINT_SECONDS: float = field(default=inf)
+    # Seleccionar, cruzar y mutar toda la población por lotes con PopulationArrays,
+    # los números aleatorios no son los mismos que con los operadores de cada cromosoma
+    ARRAY_OPERATORS: bool = field(default=False)
+    # Estado estacionario: cada generación evalúa STEADY_STATE hijos que reemplazan a los peores
+    # individuos, con 0 se reemplaza toda la población
+    STEADY_STATE: int = field(default=0)
+    # En estado estacionario, descartar antes de evaluarlos los hijos con los genes de otro individuo
+    REJECT_DUPLICATES: bool = field(default=False)
+    # Reemplazar por individuos aleatorios los equivalentes a otro de la nueva generación,
+    # en estado estacionario se usa REJECT_DUPLICATES
+    REPLACE_DUPLICATES: bool = field(default=False)
+    # En estado estacionario, detener la evaluación de los hijos que no pueden alcanzar el valor
+    # del individuo en esta posición (-1 el peor, 0 el mejor) y descartarlos,
+    # solo con las mejoras none y during sin evaluador paralelo
+    ABORT_RANK: Optional[int] = field(default=None)
 
     stats: dict = field(default_factory=dict, init=False)
+    # Estado de la ejecución, se reinicia en begin
+    elite: Optional[Chromosome] = field(default=None, init=False, repr=False)
+    generation: int = field(default=0, init=False, repr=False)
+    generations_not_improved: int = field(default=0, init=False, repr=False)
+    best_values: list = field(default_factory=list, init=False, repr=False)
+    generations_time: list[float] = field(default_factory=list, init=False, repr=False)
+    time_start: float = field(default=0, init=False, repr=False)
+    time_end: float = field(default=0, init=False, repr=False)
+    best_time: float = field(default=0, init=False, repr=False)
+    best_generation: int = field(default=0, init=False, repr=False)
+    profiler: Optional[Profiler] = field(default=None, init=False, repr=False)
+    default_max_fitness: Optional[tuple] = field(default=None, init=False, repr=False)
+    checkpoint_generation: int = field(default=0, init=False, repr=False)
+    checkpoint_time: float = field(default=0, init=False, repr=False)
+    compiled: Optional[CompiledProblem] = field(default=None, init=False, repr=False)
+    bounds: Optional[ProblemBounds] = field(default=None, init=False, repr=False)
+    # Diferencia relativa con la cota superior después de cada generación
+    gaps: list[float] = field(default_factory=list, init=False, repr=False)
 
     def __post_init__(self):
         if self.MAX_GENERATIONS == inf and self.STOP_UNIMPROVED == inf and self.MAX_DURATION == inf:
@@ -32,92 +86,380 @@ class GeneticAlgorithm:
 
     def select_with_crossover(self) -> 'GeneticAlgorithm':
         new_population = Population(
-            self.population.problem, self.population.group_improvement)
+            self.population.problem, self.population.group_improvement,
+            cache=self.population.cache, evaluator=self.population.evaluator)
 
         while len(new_population) < len(self.population):
-            # Selección aleatoria de 2 individuos eligiendo el mejor
-            parent_1 = self.population.tournament(self.TOURNAMENT_SIZE)
-            # Selección aleatoria de 2 individuos eligiendo el mejor
-            parent_2 = self.population.tournament(self.TOURNAMENT_SIZE)
+            with phase('selection'):
+                # Selección aleatoria de 2 individuos eligiendo el mejor
+                parent_1 = self.population.tournament(self.TOURNAMENT_SIZE)
+                # Selección aleatoria de 2 individuos eligiendo el mejor
+                parent_2 = self.population.tournament(self.TOURNAMENT_SIZE)
             if (parent_1 is parent_2):  # Si ambos padres son iguales, ignorar
                 continue
             # ¿Se deben cruzar los padres?
             if random.random() < self.P_CROSSOVER:
                 # Cruzar los padres
-                child_1, child_2 = parent_1 @ parent_2
+                with phase('crossover'):
+                    child_1, child_2 = parent_1 @ parent_2
                 new_population.append(child_1)
                 new_population.append(child_2)
             else:
                 # Si no se cruzan, se añaden los padres
-                new_population.append(deepcopy(parent_1))
-                new_population.append(deepcopy(parent_2))
+                with phase('copy'):
+                    new_population.append(parent_1.clone())
+                    new_population.append(parent_2.clone())
 
         self.population = new_population
         return self
 
-    def start(self, default_max_fitness: tuple[int, int, float, int], onGeneration: Optional[Callable] = None) -> 'GeneticAlgorithm':
-        elite = deepcopy(self.population.best)
-        generations_not_improved = 0
-        generation = 0
-        best_values = [elite.get_fitness]
+    def breed_steady_state(self) -> 'GeneticAlgorithm':
+        """
+        Evaluate STEADY_STATE new children and insert them in place of the worst individuals.
+
+        The parents are chosen by tournament and crossed with probability
+        P_CROSSOVER, every child is mutated with probability P_MUT. A parent
+        that is neither crossed nor mutated is not a new individual and is
+        skipped, so the survivors are not evaluated again. With
+        REJECT_DUPLICATES the children equivalent to an individual or another
+        child, with the same canonical genotype, are skipped too. A population
+        without diversity may give fewer children, at most 10 pairs of parents
+        are drawn per child. With ABORT_RANK the children that cannot reach
+        the value of the individual at that rank stop their evaluation and
+        are discarded.
+        """
+        population = self.population
+        offspring: list[Chromosome] = []
+        genotypes = {c.canonical_genotype for c in population} if self.REJECT_DUPLICATES else None
+        for _ in range(10 * self.STEADY_STATE):
+            if len(offspring) >= self.STEADY_STATE:
+                break
+            with phase('selection'):
+                parent_1 = population.tournament(self.TOURNAMENT_SIZE)
+                parent_2 = population.tournament(self.TOURNAMENT_SIZE)
+            if parent_1 is parent_2:
+                continue
+            if random.random() < self.P_CROSSOVER:
+                with phase('crossover'):
+                    children = parent_1 @ parent_2
+            else:
+                children = (parent_1, parent_2)
+            for child in children:
+                if random.random() < self.P_MUT:
+                    with phase('mutation'):
+                        _, mutant = child.mutate()
+                    # El hijo sin evaluar sigue compartiendo los primeros genes con su padre
+                    mutant.prefix_source = mutant.prefix_source or child.prefix_source
+                    child = mutant
+                elif child is parent_1 or child is parent_2:
+                    continue
+                if genotypes is not None:
+                    genotype = child.canonical_genotype
+                    if genotype in genotypes:
+                        continue
+                    genotypes.add(genotype)
+                offspring.append(child)
+        threshold = population.individuals[self.ABORT_RANK].cost_value if self.ABORT_RANK is not None else None
+        population.insert_offspring(offspring[:self.STEADY_STATE], threshold)
+        return self
+
+    def breed_arrays(self) -> 'GeneticAlgorithm':
+        """
+        Next population with the operators of PopulationArrays on the whole population.
+
+        The population must be sorted by fitness. As select_with_crossover and
+        mutation, pairs of different parents are chosen by tournament and
+        crossed with probability P_CROSSOVER, otherwise copied, and every
+        child is mutated with probability P_MUT. The random numbers are seeded
+        from the random module, so the run is repeated with the same seed.
+        """
+        parents = self.population.individuals
+        if self.compiled is None or self.compiled.problem is not self.population.problem:
+            self.compiled = CompiledProblem.compile(self.population.problem)
+        rng = np.random.default_rng(random.getrandbits(64))
+        pairs = (len(parents) + 1) // 2
+
+        with phase('selection'):
+            first = np.empty(0, dtype=np.int64)
+            second = np.empty(0, dtype=np.int64)
+            while len(first) < pairs:
+                winners = tournament(2 * pairs, len(parents), self.TOURNAMENT_SIZE, rng).reshape(-1, 2)
+                # Si ambos padres son iguales, ignorar
+                winners = winners[winners[:, 0] != winners[:, 1]]
+                first = np.concatenate((first, winners[:, 0]))[:pairs]
+                second = np.concatenate((second, winners[:, 1]))[:pairs]
+        crossed = np.repeat(rng.random(pairs) < self.P_CROSSOVER, 2)
+        points = np.repeat(rng.integers(1, len(parents[0].genes), size=pairs), 2)
+        # Cada par da dos hijos seguidos, el segundo con los padres intercambiados
+        mothers = np.stack((first, second), axis=1).ravel()
+        fathers = np.stack((second, first), axis=1).ravel()
+
+        with phase('crossover'):
+            arrays = PopulationArrays.from_chromosomes(self.compiled, parents)
+            children = arrays.crossover(mothers, fathers, points)
+        with phase('mutation'):
+            mutated = rng.random(len(mothers)) < self.P_MUT
+            rows = np.flatnonzero(mutated)
+            # Los hijos sin cruzar son copias de su padre
+            copies = rows[~crossed[rows]]
+            children.types[copies] = arrays.types[mothers[copies]]
+            children.counts[copies] = arrays.counts[mothers[copies]]
+            children.rotations[copies] = arrays.rotations[mothers[copies]]
+            children.genes[copies] = arrays.genes[mothers[copies]]
+            children.mutate(rows, rng.integers(0, 3, size=len(rows)), rng)
+
+        new_population = Population(
+            self.population.problem, self.population.group_improvement,
+            cache=self.population.cache, evaluator=self.population.evaluator)
+        for row, (mother, is_crossed, is_mutated, point) in enumerate(
+                zip(mothers.tolist(), crossed.tolist(), mutated.tolist(), points.tolist())):
+            parent = parents[mother]
+            if not is_crossed and not is_mutated:
+                with phase('copy'):
+                    new_population.append(parent.clone())
+                continue
+            child = children.chromosome(row)
+            if parent.snapshots:
+                # Los genes iguales al padre se comprueban al evaluar
+                child.prefix_source = (parent, point if is_crossed else len(child.genes))
+            new_population.append(child)
+
+        if self.REPLACE_DUPLICATES:
+            new_population.replace_duplicates()
+        self.population = new_population.evaluate()
+        return self
+
+    def begin(self) -> 'GeneticAlgorithm':
+        """Reset the state of the run, the population must be initialized"""
+        self.elite = self.population.best.clone()
+        self.generations_not_improved = 0
+        self.generation = 0
+        self.best_values = [self.elite.get_fitness]
+        self.bounds = ProblemBounds.compute(self.population.problem)
+        self.gaps = [self.bounds.gap(self.elite.get_fitness)]
         # best_boxes = [len(elite.result)]
-        time_start = time.time()
+        self.time_start = time.time()
         # generations_duration = []
-        generations_time = []
-        time_generation = time_start
-        time_end = time_start
-        best_time = 0
-        best_generation = 0
+        self.generations_time = []
+        self.time_end = self.time_start
+        self.best_time = 0
+        self.best_generation = 0
+        self.profiler = Profiler() if self.PROFILE else None
+        self.checkpoint_generation = 0
+        self.checkpoint_time = self.time_start
+        return self
+
+    @property
+    def running(self) -> bool:
         # Iterar hasta que no se mejore en M generaciones o se alcance la generación N
-        while (time_end - time_start) < self.MAX_DURATION and generations_not_improved < self.STOP_UNIMPROVED and generation < self.MAX_GENERATIONS:
-            # print("-> Generation %d best value: %d" % (
-            #      generation, elite.get_fitness))
+        return (self.time_end - self.time_start) < self.MAX_DURATION and \
+            self.generations_not_improved < self.STOP_UNIMPROVED and \
+            self.generation < self.MAX_GENERATIONS and \
+            self.gaps[-1] > self.STOP_GAP
+
+    def step(self, onGeneration: Optional[Callable] = None) -> 'GeneticAlgorithm':
+        """
+        Run one generation.
+
+        Args:
+            onGeneration (Optional[Callable]): Called after the generation with the
+                best values and the population, and with PROFILE also with the
+                counters of the generation.
+        """
+        # El profiler de este GA registra solo durante su generación
+        previous, Profiler.active = Profiler.active, self.profiler
+        try:
+            return self._step(onGeneration)
+        finally:
+            Profiler.active = previous
+
+    def _step(self, onGeneration: Optional[Callable]) -> 'GeneticAlgorithm':
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start('generation')
+        # print("-> Generation %d best value: %d" % (
+        #      generation, elite.get_fitness))
+        if self.STEADY_STATE:
+            self.breed_steady_state()
+        elif self.ARRAY_OPERATORS:
+            self.breed_arrays()
+        else:
             self.select_with_crossover()
+            if self.REPLACE_DUPLICATES:
+                self.population.replace_duplicates()
 
             self.population.mutation(self.P_MUT)
 
-            new_best = self.population.best
-            if new_best > elite:  # Si el nuevo mejor es mejor que el elite, reemplazar
-                elite = deepcopy(new_best)
-                generations_not_improved = 0
-                best_time = time.time() - time_start
-                best_generation = generation
-            else:
-                if new_best < elite:
-                    del self.population.individuals[-1]
-                    new_best = deepcopy(elite)
-                    self.population.replace_worst(new_best)
-                generations_not_improved += 1
-
-            best_values.append(new_best.get_fitness)
-            # best_boxes.append(len(new_best.result))
+        new_best = self.population.best
+        if new_best > self.elite:  # Si el nuevo mejor es mejor que el elite, reemplazar
+            self.elite = new_best.clone()
+            self.generations_not_improved = 0
+            self.best_time = time.time() - self.time_start
+            self.best_generation = self.generation
+        else:
+            if new_best < self.elite:
+                self.population.remove_worst()
+                new_best = self.elite.clone()
+                self.population.replace_worst(new_best)
+            self.generations_not_improved += 1
+
+        self.best_values.append(new_best.get_fitness)
+        self.gaps.append(self.bounds.gap(new_best.get_fitness))
+        # best_boxes.append(len(new_best.result))
+        if profiler is not None:
+            profiler.stop()
+            counts = profiler.end_generation()
             if callable(onGeneration):
-                onGeneration(best_values, self.population)
-            generation += 1
-            time_end = time.time()
-            # generations_duration.append(time_end-time_generation)
-            generations_time.append(time_end-time_start)
-            time_generation = time_end
+                onGeneration(self.best_values, self.population, counts)
+        elif callable(onGeneration):
+            onGeneration(self.best_values, self.population)
+        self.generation += 1
+        self.time_end = time.time()
+        # generations_duration.append(time_end-time_generation)
+        self.generations_time.append(self.time_end-self.time_start)
+        if self.CHECKPOINT_PATH and (
+                self.generation - self.checkpoint_generation >= self.CHECKPOINT_GENERATIONS or
+                self.time_end - self.checkpoint_time >= self.CHECKPOINT_SECONDS):
+            self.checkpoint(self.CHECKPOINT_PATH)
+        return self
+
+    def checkpoint(self, path: str) -> 'GeneticAlgorithm':
+        """
+        Save the state of the run between two generations.
+
+        The population and the elite are saved as genotypes with the results
+        of their evaluations, with the state of the random module and the
+        statistics, so the run resumed with `resume` follows the same
+        trajectory.
+
+        Args:
+            path (str): The file of the checkpoint, replaced if it exists.
+        """
+        individuals: list[SavedChromosome] = []
+        order: list[int] = []
+        # Los individuos repetidos (mismo objeto) se guardan una vez
+        saved: dict[int, int] = {}
+        for chromosome in self.population:
+            if id(chromosome) not in saved:
+                saved[id(chromosome)] = len(individuals)
+                individuals.append(SavedChromosome.save(chromosome))
+            order.append(saved[id(chromosome)])
+        cache = self.population.cache
+        settings = {name: getattr(self, name) for name in self.__dataclass_fields__
+                    if name.isupper()}
+        state = {
+            'generation': self.generation,
+            'generations_not_improved': self.generations_not_improved,
+            'best_values': self.best_values,
+            'gaps': self.gaps,
+            'generations_time': self.generations_time,
+            'elapsed': self.time_end - self.time_start,
+            'best_time': self.best_time,
+            'best_generation': self.best_generation,
+            'profiler': self.profiler,
+            'default_max_fitness': self.default_max_fitness,
+        }
+        Checkpoint(self.population.problem, self.population.group_improvement.name,
+                   individuals, order, SavedChromosome.save(self.elite), settings, state,
+                   random.getstate(),
+                   (cache.maxsize, cache.store_layout) if cache is not None else None).save(path)
+        self.checkpoint_generation = self.generation
+        self.checkpoint_time = time.time()
+        return self
+
+    @staticmethod
+    def load_checkpoint(path: str, evaluator: Optional[ParallelEvaluator] = None) -> 'GeneticAlgorithm':
+        """
+        Rebuild a GeneticAlgorithm saved with `checkpoint`, ready to continue with `run`.
+
+        The random module is set to its state at the time of the checkpoint.
+
+        Args:
+            path (str): The file of the checkpoint.
+            evaluator (Optional[ParallelEvaluator]): Evaluator of the population.
+
+        Returns:
+            GeneticAlgorithm: The algorithm in the state of the checkpoint.
+        """
+        saved = Checkpoint.load(path)
+        compiled = CompiledProblem.compile(saved.problem)
+        population = Population(saved.problem, GroupImprovement[saved.group_improvement],
+                                cache=FitnessCache(*saved.cache) if saved.cache else None,
+                                evaluator=evaluator)
+        individuals = [s.restore(compiled) for s in saved.individuals]
+        population.individuals = [individuals[i] for i in saved.order]
+        population.evaluated = True
+
+        ga = GeneticAlgorithm(population=population, **saved.settings)
+        state = saved.state
+        ga.elite = saved.elite.restore(compiled)
+        ga.generation = state['generation']
+        ga.generations_not_improved = state['generations_not_improved']
+        ga.best_values = state['best_values']
+        ga.bounds = ProblemBounds.compute(saved.problem)
+        ga.gaps = state.get('gaps') or [ga.bounds.gap(value) for value in ga.best_values]
+        ga.generations_time = state['generations_time']
+        # Continuar contando la duración desde la del checkpoint
+        ga.time_end = time.time()
+        ga.time_start = ga.time_end - state['elapsed']
+        ga.best_time = state['best_time']
+        ga.best_generation = state['best_generation']
+        ga.profiler = state['profiler']
+        ga.default_max_fitness = state['default_max_fitness']
+        ga.checkpoint_generation = ga.generation
+        ga.checkpoint_time = ga.time_end
+        random.setstate(saved.random_state)
+        return ga
+
+    @staticmethod
+    def resume(path: str, onGeneration: Optional[Callable] = None,
+               evaluator: Optional[ParallelEvaluator] = None) -> 'GeneticAlgorithm':
+        """Continue until the end a run saved with `checkpoint`"""
+        return GeneticAlgorithm.load_checkpoint(path, evaluator).run(onGeneration)
+
+    def finish(self, default_max_fitness: tuple[int, int, float, int]) -> 'GeneticAlgorithm':
+        """Collect the statistics of the run"""
         self.stats = {
             'best_value': self.population.best.fitness,
             'problem_id': self.population.problem.id,
             'types_count': len(self.population.problem.box_types),
             'group_improvement': self.population.group_improvement.name,
-            'generations': generation,
+            'generations': self.generation,
             'best': {
-                'best_time': best_time,
-                'best_generation': best_generation,
+                'best_time': self.best_time,
+                'best_generation': self.best_generation,
                 # 'best_boxes': best_boxes,
             },
-            'best_values': best_values,
+            'best_values': self.best_values,
+            'bounds': {
+                'upper_bound': self.bounds.upper_bound,
+                'total_value': self.bounds.total_value,
+                'knapsack_value': self.bounds.knapsack_value,
+                'gaps': self.gaps,
+            },
             'timings': {
-                'start_time': time_start,
-                'end_time': time_end,
-                'duration': time_end-time_start,
+                'start_time': self.time_start,
+                'end_time': self.time_end,
+                'duration': self.time_end-self.time_start,
                 # 'generations_duration': generations_duration,
-                'generations_time': generations_time,
+                'generations_time': self.generations_time,
             },
             'default_max_fitness': default_max_fitness,
             'best_solution': [(g.type.type, g.box_count, g.rotation) for g in self.population.best.genes],
         }
+        if self.population.cache is not None:
+            self.stats['cache'] = self.population.cache.stats
+        if self.profiler is not None:
+            self.stats['profile'] = self.profiler.stats
         return self
+
+    def start(self, default_max_fitness: tuple[int, int, float, int], onGeneration: Optional[Callable] = None) -> 'GeneticAlgorithm':
+        self.begin()
+        self.default_max_fitness = default_max_fitness
+        return self.run(onGeneration)
+
+    def run(self, onGeneration: Optional[Callable] = None) -> 'GeneticAlgorithm':
+        """Run generations until the stop conditions and collect the statistics"""
+        while self.running:
+            self.step(onGeneration)
+        return self.finish(self.default_max_fitness)
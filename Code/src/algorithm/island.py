@@ -0,0 +1,273 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import multiprocessing
+import random
+import sys
+from typing import Optional
+
+from lcp.src.problems import Problem
+from .checkpoint import SavedChromosome
+from .compiled_problem import CompiledProblem
+from .fitness_cache import FitnessCache
+from .population import GroupImprovement, Population
+from .genetic_algorithm import GeneticAlgorithm
+
+inf = sys.maxsize
+
+# Cromosoma evaluado enviado a otra isla
+Migrant = SavedChromosome
+
+TOPOLOGIES = ['ring', 'full']
+
+
+def emigrants(population: Population, count: int) -> list[Migrant]:
+    """The best `count` chromosomes of an evaluated population"""
+    return [SavedChromosome.save(chromosome) for chromosome in population.individuals[:count]]
+
+
+class Island:
+    """
+    A population evolved by its own GeneticAlgorithm.
+
+    The island keeps its own state of the random module, so islands running in
+    the same process give the same results as islands in separate processes.
+    The state of the caller is restored after every call.
+
+    Args:
+        problem (Problem): The problem to solve.
+        group_improvement (GroupImprovement): Improvement of the population.
+        individuals (int): Size of the population.
+        seed (int): Seed of the random individuals and of the GA.
+        options (dict): Parameters of the GeneticAlgorithm.
+        cache_size (int): Size of the FitnessCache, 0 to evaluate without cache.
+    """
+
+    def __init__(self, problem: Problem, group_improvement: GroupImprovement, individuals: int,
+                 seed: int, options: dict, cache_size: int = 0):
+        self.random_state = random.Random(seed).getstate()
+        self.compiled = CompiledProblem.compile(problem)
+        with self.own_random():
+            population = Population(problem, group_improvement,
+                                    cache=FitnessCache(cache_size) if cache_size else None)
+            population.individuals = population.generate_random_individuals(individuals)
+            population.evaluate()
+            self.ga = GeneticAlgorithm(population=population, **options).begin()
+
+    @contextmanager
+    def own_random(self):
+        """Use the state of the random module of the island, then restore the one of the caller"""
+        caller_state = random.getstate()
+        random.setstate(self.random_state)
+        try:
+            yield
+        finally:
+            self.random_state = random.getstate()
+            random.setstate(caller_state)
+
+    def run(self, generations: int, migrants: list[Migrant], count: int) -> tuple[list[Migrant], bool]:
+        """
+        Receive migrants and run some generations.
+
+        Args:
+            generations (int): Maximum number of generations to run.
+            migrants (list[Migrant]): Chromosomes that replace the worst of the population.
+            count (int): Number of chromosomes to send to other islands.
+
+        Returns:
+            tuple[list[Migrant], bool]: The best chromosomes of the island and
+                whether the GA has not reached its stop conditions.
+        """
+        with self.own_random():
+            self.ga.population.immigrate([m.restore(self.compiled) for m in migrants])
+            for _ in range(generations):
+                if not self.ga.running:
+                    break
+                self.ga.step()
+        return emigrants(self.ga.population, count), self.ga.running
+
+    def finish(self, default_max_fitness: tuple[int, int, float, int]) -> dict:
+        return self.ga.finish(default_max_fitness).stats
+
+
+def _island_process(connection, args: tuple):
+    """Run an island in its own process, following the commands of the IslandModel"""
+    island = Island(*args)
+    while True:
+        command, payload = connection.recv()
+        if command == 'run':
+            connection.send(island.run(*payload))
+        elif command == 'finish':
+            connection.send(island.finish(payload))
+            break
+    connection.close()
+
+
+class _LocalIsland:
+    """Island in the current process with the same interface as an island process"""
+
+    def __init__(self, args: tuple):
+        self.island = Island(*args)
+
+    def send(self, command: str, payload):
+        self.reply = self.island.run(*payload) if command == 'run' else self.island.finish(payload)
+
+    def receive(self):
+        return self.reply
+
+    def close(self):
+        pass
+
+
+class _ProcessIsland:
+    def __init__(self, args: tuple):
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_island_process, args=(child, args))
+        self.process.start()
+        child.close()
+
+    def send(self, command: str, payload):
+        self.connection.send((command, payload))
+
+    def receive(self):
+        return self.connection.recv()
+
+    def close(self):
+        self.connection.close()
+        self.process.join()
+
+
+@dataclass
+class IslandModel:
+    """
+    Run several populations of the same problem, each one in its own process.
+
+    Every island runs select_with_crossover and mutation independently, each
+    one possibly with a different GroupImprovement. Every MIGRATION_INTERVAL
+    generations the islands send their best MIGRANTS chromosomes to their
+    neighbours, which replace their worst ones. In the 'ring' topology each
+    island sends to the next one, in 'full' to all the others. The model ends
+    when every island has reached its stop conditions.
+
+    The results only depend on the seed, not on the processes, unless the
+    islands are stopped by MAX_DURATION.
+
+    Attributes:
+        problem (Problem): The problem to solve.
+        improvements (list[GroupImprovement]): The improvement of each island.
+        INDIVIDUALS (int): Size of the population of each island.
+        PROCESSES (bool): Run each island in its own process, otherwise in this one.
+        CACHE_SIZE (int): Size of the FitnessCache of each island, 0 disables it.
+        seed (int): The island i uses the seed `seed + i`.
+        stats (dict): The statistics of the best island, as those of
+            GeneticAlgorithm, with the best values of all the islands, the
+            generations of the longest island, the sum of the generations of
+            all the islands in 'total_generations', the statistics of each
+            island in 'islands' and the migration parameters.
+    """
+    problem: Problem
+    improvements: list[GroupImprovement]
+
+    INDIVIDUALS: int = field(default=100)
+    MIGRATION_INTERVAL: int = field(default=5)
+    MIGRANTS: int = field(default=2)
+    TOPOLOGY: str = field(default='ring')
+    PROCESSES: bool = field(default=True)
+    CACHE_SIZE: int = field(default=0)
+
+    TOURNAMENT_SIZE: int = field(default=2)
+    P_CROSSOVER: float = field(default=0.8)
+    P_MUT: float = field(default=0.05)
+    P_MUT_GEN: float = field(default=0.05)
+
+    MAX_GENERATIONS: int = field(default=inf)
+    STOP_UNIMPROVED: int = field(default=inf)
+    MAX_DURATION: int = field(default=inf)
+
+    seed: int = field(default=0)
+    stats: dict = field(default_factory=dict, init=False)
+
+    def __post_init__(self):
+        if self.TOPOLOGY not in TOPOLOGIES:
+            raise ValueError("TOPOLOGY must be one of %s" % TOPOLOGIES)
+        if not self.improvements:
+            raise ValueError("At least one island is required")
+        if self.MAX_GENERATIONS == inf and self.STOP_UNIMPROVED == inf and self.MAX_DURATION == inf:
+            raise ValueError(
+                "At least one of MAX_GENERATIONS, STOP_UNIMPROVED or MAX_TIME must be set")
+
+    def neighbours(self, index: int) -> list[int]:
+        """Islands that receive the migrants of the island `index`"""
+        count = len(self.improvements)
+        if self.TOPOLOGY == 'ring':
+            return [(index + 1) % count] if count > 1 else []
+        return [i for i in range(count) if i != index]
+
+    def start(self, default_max_fitness: Optional[tuple[int, int, float, int]] = None) -> 'IslandModel':
+        options = {
+            'TOURNAMENT_SIZE': self.TOURNAMENT_SIZE,
+            'P_CROSSOVER': self.P_CROSSOVER,
+            'P_MUT': self.P_MUT,
+            'P_MUT_GEN': self.P_MUT_GEN,
+            'MAX_GENERATIONS': self.MAX_GENERATIONS,
+            'STOP_UNIMPROVED': self.STOP_UNIMPROVED,
+            'MAX_DURATION': self.MAX_DURATION,
+        }
+        island_class = _ProcessIsland if self.PROCESSES else _LocalIsland
+        islands = [island_class((self.problem, improvement, self.INDIVIDUALS,
+                                 self.seed + i, options, self.CACHE_SIZE))
+                   for i, improvement in enumerate(self.improvements)]
+        try:
+            running = [True] * len(islands)
+            migrants: list[list[Migrant]] = [[] for _ in islands]
+            epochs = 0
+            while any(running):
+                active = [i for i, r in enumerate(running) if r]
+                for i in active:
+                    islands[i].send('run', (self.MIGRATION_INTERVAL, migrants[i], self.MIGRANTS))
+                migrants = [[] for _ in islands]
+                for i in active:
+                    sent, running[i] = islands[i].receive()
+                    for j in self.neighbours(i):
+                        migrants[j].extend(sent)
+                epochs += 1
+            for island in islands:
+                island.send('finish', default_max_fitness)
+            islands_stats = [island.receive() for island in islands]
+        finally:
+            for island in islands:
+                island.close()
+
+        self.stats = self.merge_stats(islands_stats)
+        self.stats['migration'] = {
+            'topology': self.TOPOLOGY,
+            'interval': self.MIGRATION_INTERVAL,
+            'migrants': self.MIGRANTS,
+            'epochs': epochs,
+        }
+        return self
+
+    @staticmethod
+    def merge_stats(islands_stats: list[dict]) -> dict:
+        """The statistics of the best island with the best value of every generation among all islands"""
+        best = max(islands_stats, key=lambda s: s['best_value'])
+        length = max(len(s['best_values']) for s in islands_stats)
+        # Las islas detenidas antes mantienen su último valor
+        best_values = [max(s['best_values'][min(g, len(s['best_values']) - 1)]
+                           for s in islands_stats)
+                       for g in range(length)]
+        return {
+            **best,
+            'group_improvement': ','.join(s['group_improvement'] for s in islands_stats),
+            # Generaciones de la isla más larga, como best_values
+            'generations': length - 1,
+            'total_generations': sum(s['generations'] for s in islands_stats),
+            'best_values': best_values,
+            'timings': {
+                **best['timings'],
+                'start_time': min(s['timings']['start_time'] for s in islands_stats),
+                'end_time': max(s['timings']['end_time'] for s in islands_stats),
+                'duration': max(s['timings']['end_time'] for s in islands_stats) -
+                min(s['timings']['start_time'] for s in islands_stats),
+            },
+            'islands': islands_stats,
+        }
@@ -0,0 +1,97 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+from typing import Optional
+
+from lcp.src.problems import Problem
+from .dblf import DBLF
+from .chromosome import Chromosome, Improvement
+from .compiled_problem import CompiledProblem, Genotype
+from .fitness_cache import CacheEntry
+
+# Estado de cada proceso del pool, se carga una sola vez al iniciarlo
+_compiled: Optional[CompiledProblem] = None
+
+
+def _initialize(compiled: CompiledProblem, settings: dict):
+    global _compiled
+    _compiled = compiled
+    DBLF.BACKEND = settings['backend']
+    DBLF.COMPACT_INDEX_MIN = settings['compact_index_min']
+    Chromosome.BULK_PLACEMENT = settings['bulk_placement']
+
+
+def _evaluate(task: tuple[Genotype, str, bool, bool]) -> tuple[CacheEntry, Optional[CacheEntry]]:
+    """Evaluate a genotype in a worker, and improve it afterwards if `late`"""
+    genotype, improvement, late, store_layout = task
+    chromosome = _compiled.chromosome(genotype)
+    chromosome.evaluate(Improvement[improvement], layout=store_layout)
+    entry = CacheEntry.from_chromosome(chromosome, store_layout)
+    if not late:
+        return entry, None
+    chromosome.evaluate_with_improvement_late()
+    return entry, CacheEntry.from_chromosome(chromosome, store_layout)
+
+
+class ParallelEvaluator:
+    """
+    Persistent pool of processes that evaluates the chromosomes of one problem.
+
+    Every worker receives the compiled problem once when it starts, afterwards only the
+    genotypes, (type, box_count, rotation) of every gene, are sent and only the
+    box counts and the fitness values come back, the boxes only if
+    `store_layout`. The results are applied with Chromosome.restore, so a
+    chromosome evaluated without its layout rebuilds it when needed.
+
+    The evaluation does not use random numbers, so the results do not depend
+    on the number of workers nor on the order in which they finish.
+
+    Attributes:
+        problem (Problem): The problem of the chromosomes to evaluate.
+        max_workers (int): Number of processes, by default the number of CPUs.
+        store_layout (bool): Send back the list of boxes of every chromosome.
+    """
+
+    def __init__(self, problem: Problem, max_workers: Optional[int] = None, store_layout: bool = False):
+        self.problem = problem
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.store_layout = store_layout
+        settings = {
+            'backend': DBLF.BACKEND,
+            'compact_index_min': DBLF.COMPACT_INDEX_MIN,
+            'bulk_placement': Chromosome.BULK_PLACEMENT,
+        }
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                            initializer=_initialize,
+                                            initargs=(CompiledProblem.compile(problem), settings))
+
+    def __enter__(self) -> 'ParallelEvaluator':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def map(self, genotypes: list[Genotype], improvement: Improvement,
+            late: bool = False) -> list[tuple[CacheEntry, Optional[CacheEntry]]]:
+        """
+        Evaluate genotypes in the pool.
+
+        Args:
+            genotypes (list[Genotype]): The genotypes to evaluate.
+            improvement (Improvement): Improvement used during the evaluation.
+            late (bool): Also apply the late improvement after the evaluation.
+
+        Returns:
+            list[tuple[CacheEntry, Optional[CacheEntry]]]: For every genotype, in the
+                same order, the result of the evaluation and the result after the
+                late improvement if `late`.
+        """
+        if not genotypes:
+            return []
+        # Varios genotipos por envío para reducir la comunicación entre procesos
+        chunksize = max(1, len(genotypes) // (self.max_workers * 4))
+        tasks = [(genotype, improvement.name, late, self.store_layout)
+                 for genotype in genotypes]
+        return list(self.executor.map(_evaluate, tasks, chunksize=chunksize))
@@ -1,11 +1,18 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
+import heapq
 import random
 from typing import Iterator, Optional
 
+import numpy as np
 
 from lcp.src.problems import Problem
 from .chromosome import Chromosome, Gene, Improvement
+from .compiled_problem import CompiledProblem
+from .fitness_cache import CacheEntry, FitnessCache
+from .parallel import ParallelEvaluator
+from .population_arrays import PopulationArrays
+from .profiler import Profiler, phase
 
 GroupImprovement = Enum(
     'GroupImprovement', ['none', 'during', 'late_all', 'late_some', 'late_best'])
@@ -18,6 +25,13 @@ class Population:
                                           init=False)
     group_improvement: GroupImprovement = field(default=GroupImprovement.none)
     evaluated: bool = field(default=False, init=False)
+    cache: Optional[FitnessCache] = field(default=None)
+    evaluator: Optional[ParallelEvaluator] = field(default=None)
+    # Clave entera del fitness de cada individuo en el mismo orden, None si cambió
+    keys: list[Optional[int]] = field(default_factory=list, init=False, repr=False)
+    # Resultado de cada genotipo canónico evaluado, con las cajas de los genes con cajas,
+    # los cromosomas equivalentes se restauran sin evaluarlos
+    twins: dict[tuple, CacheEntry] = field(default_factory=dict, init=False, repr=False)
 
     def __iter__(self) -> Iterator[Chromosome]:
         return iter(self.individuals)
@@ -34,6 +48,15 @@ class Population:
     def replace_worst(self, chromosome: Chromosome) -> 'Population':
         self.individuals.insert(0, chromosome)
         del self.individuals[-1]
+        if self.keys:
+            self.keys.insert(0, chromosome.fitness_key)
+            del self.keys[-1]
+        return self
+
+    def remove_worst(self) -> 'Population':
+        del self.individuals[-1]
+        if self.keys:
+            del self.keys[-1]
         return self
 
     @property
@@ -52,7 +75,18 @@ class Population:
     def best_fitness(self) -> float:
         return self.best.get_fitness
 
-    def generate_random_individuals(self, count: int = 100) -> list[Chromosome]:
+    def generate_random_individuals(self, count: int = 100, arrays: bool = False) -> list[Chromosome]:
+        """
+        Random individuals, the first one with the maximum counts of every type.
+
+        With `arrays` the genotypes are generated at once as PopulationArrays,
+        with random numbers seeded from the random module.
+        """
+        if arrays:
+            rng = np.random.default_rng(random.getrandbits(64))
+            generated = PopulationArrays.random(CompiledProblem.compile(self.problem), count, rng)
+            return [generated.chromosome(row, row == 0) for row in range(count)]
+
         individuals: list[Chromosome] = []
         # Generar dos soluciones iniciales usando los valores mínimos y máximos propuestos
 
@@ -66,58 +100,343 @@ class Population:
         # individuals.append(Chromosome(genes, self.problem.container))
 
         for _ in range(count-1):  # Generar 2 menos
-            genes = [Gene(t, random.randint(t.min_count, t.max_count),  # t.min_count
-                          random.randint(0, 1)) for t in self.problem.box_types]
-            random.shuffle(genes)
-            individuals.append(Chromosome(genes, self.problem.container))
+            individuals.append(self.random_individual())
 
         return individuals
 
+    def random_individual(self) -> Chromosome:
+        genes = [Gene(t, random.randint(t.min_count, t.max_count),  # t.min_count
+                      random.randint(0, 1)) for t in self.problem.box_types]
+        random.shuffle(genes)
+        return Chromosome(genes, self.problem.container)
+
+    def replace_duplicates(self) -> int:
+        """
+        Replace with random individuals the individuals equivalent to a previous one.
+
+        Two individuals are equivalent when they have the same canonical
+        genotype, they place the same boxes. The random individuals are new
+        evaluations, in exchange the copies of an individual do not take over
+        the population.
+
+        Returns:
+            int: The number of replaced individuals.
+        """
+        seen: set[tuple] = set()
+        replaced = 0
+        for j, chromosome in enumerate(self.individuals):
+            key = chromosome.canonical_genotype
+            if key not in seen:
+                seen.add(key)
+                continue
+            self.individuals[j] = self.random_individual()
+            if self.keys:
+                self.keys[j] = None
+            replaced += 1
+        if replaced and Profiler.active is not None:
+            Profiler.active.count(replaced_duplicates=replaced)
+        return replaced
+
+    def immigrate(self, chromosomes: list[Chromosome]) -> 'Population':
+        """Replace the worst individuals with evaluated chromosomes, keeping the order by fitness"""
+        chromosomes = chromosomes[:len(self.individuals)]
+        if chromosomes:
+            synced = len(self.keys) == len(self.individuals)
+            del self.individuals[-len(chromosomes):]
+            self.individuals.extend(chromosomes)
+            if synced:
+                del self.keys[-len(chromosomes):]
+                self.keys.extend([None] * len(chromosomes))
+                self.insert_changed()
+            else:
+                self.sort()
+        return self
+
+    def insert_offspring(self, offspring: list[Chromosome], threshold: Optional[int] = None) -> 'Population':
+        """
+        Evaluate new chromosomes and put them in place of the worst individuals, keeping the order by fitness.
+
+        The improvements are the ones of evaluate: during the evaluation for
+        `during`, every offspring for `late_all`, the offspring that enter the
+        upper half for `late_some` and an offspring that becomes the best for
+        `late_best`.
+
+        With `threshold`, for `none` and `during` evaluated in this process,
+        the offspring whose value cannot reach it stop their evaluation and
+        are discarded, so fewer individuals are replaced.
+        """
+        if not offspring:
+            return self
+        late = self.group_improvement in (GroupImprovement.late_some, GroupImprovement.late_best)
+        # Se evalúan como una población con los mismos ajustes, sin la mejora tardía de una parte
+        children = Population(self.problem,
+                              GroupImprovement.none if late else self.group_improvement,
+                              cache=self.cache, evaluator=self.evaluator)
+        children.individuals = list(offspring)
+        if threshold is not None and self.evaluator is None and \
+                self.group_improvement in (GroupImprovement.none, GroupImprovement.during):
+            improvement = Improvement.during if self.group_improvement == GroupImprovement.during \
+                else Improvement.none
+            children.individuals = [c for c in children.individuals
+                                    if not children.evaluate_individual(c, improvement, threshold).dominated
+                                    and c.cost_value >= threshold]
+        children.evaluate()
+        self.immigrate(children.individuals)
+        if late:
+            upper = len(self.individuals) // 2 if self.group_improvement == GroupImprovement.late_some else 1
+            new = {id(c) for c in children.individuals}
+            improved = [j for j in range(upper) if id(self.individuals[j]) in new]
+            if self.evaluator is not None:
+                self.improve_late_parallel([self.individuals[j] for j in improved])
+            for j in improved:
+                self.improve_late(self.individuals[j])
+                self.keys[j] = None
+            self.insert_changed()
+        return self
+
     def append(self, chromosome: Chromosome) -> 'Population':
         self.individuals.append(chromosome)
         return self
 
+    def evaluate_individual(self, chromosome: Chromosome, improvement: Improvement = Improvement.none,
+                            threshold: Optional[int] = None) -> Chromosome:
+        """
+        Evaluate a chromosome, reusing the result of an equivalent individual or the cached result of the same genes.
+
+        With `threshold` the evaluation stops when the chromosome cannot reach
+        that value, it is then `dominated` and its result is not kept.
+        """
+        if chromosome.evaluated:
+            return chromosome
+        twin_key = (improvement.name, chromosome.canonical_genotype)
+        twin = self.twins.get(twin_key)
+        if twin is not None:
+            if Profiler.active is not None:
+                Profiler.active.count(twins=1)
+            return self.restore_twin(chromosome, twin, improvement)
+        with_boxes = [i for i, g in enumerate(chromosome.genes) if g.box_count > 0]
+        if self.cache is None:
+            chromosome.evaluate(improvement, threshold=threshold)
+        else:
+            key = self.cache.key(chromosome, improvement)
+            entry = self.cache.get(key)
+            if entry is None:
+                chromosome.evaluate(improvement, threshold=threshold)
+                if not chromosome.dominated:
+                    self.cache.put(key, chromosome)
+            else:
+                self.restore_individual(chromosome, entry, improvement)
+        if chromosome.dominated:
+            return chromosome
+        self.twins[twin_key] = CacheEntry(tuple(chromosome.genes[i].box_count for i in with_boxes),
+                                          chromosome.occupied_vol, chromosome.number_boxes,
+                                          chromosome.cost_value, chromosome.improved)
+        return chromosome
+
+    @staticmethod
+    def restore_twin(chromosome: Chromosome, twin: CacheEntry, improvement: Improvement) -> Chromosome:
+        """Restore a chromosome with the result of an equivalent one, its genes without boxes place none"""
+        box_counts = iter(twin.box_counts)
+        return Population.restore_individual(
+            chromosome, replace(twin, box_counts=tuple(next(box_counts) if g.box_count > 0 else 0
+                                                        for g in chromosome.genes)),
+            improvement)
+
+    @staticmethod
+    def restore_individual(chromosome: Chromosome, entry: CacheEntry, improvement: Improvement,
+                           late_improved: bool = False, decoded_counts: Optional[tuple[int, ...]] = None) -> Chromosome:
+        return chromosome.restore(entry.box_counts, entry.occupied_vol, entry.number_boxes,
+                                  entry.cost_value, entry.improved, improvement, entry.result,
+                                  late_improved, decoded_counts)
+
+    def restore_late(self, chromosome: Chromosome) -> Optional[Chromosome]:
+        """Restore the cached late improvement of an evaluated chromosome, None if it is not cached"""
+        if self.cache is None:
+            return None
+        entry = self.cache.get(FitnessCache.key(chromosome, chromosome.improvement, late=True))
+        if entry is None:
+            return None
+        # Los genes tienen las cajas colocadas en la evaluación, de las que parte la mejora
+        return self.restore_individual(chromosome, entry, chromosome.improvement, True,
+                                       tuple(g.box_count for g in chromosome.genes))
+
+    def improve_late(self, chromosome: Chromosome) -> Chromosome:
+        """Apply the late improvement to an evaluated chromosome, reusing the cached result of the same placed boxes"""
+        if self.cache is None or chromosome.late_improved:
+            return chromosome.evaluate_with_improvement_late()
+        if self.restore_late(chromosome) is not None:
+            return chromosome
+        key = FitnessCache.key(chromosome, chromosome.improvement, late=True)
+        self.cache.put(key, chromosome.evaluate_with_improvement_late())
+        return chromosome
+
+    def evaluate_parallel(self, improvement: Improvement, late: bool = False) -> 'Population':
+        """
+        Evaluate in the parallel evaluator the individuals not evaluated yet.
+
+        Individuals found in the cache are restored from it and individuals with
+        the same genes are evaluated once.
+
+        Args:
+            improvement (Improvement): Improvement used during the evaluation.
+            late (bool): Also apply the late improvement, the cache keeps the
+                results before and after it.
+        """
+        pending: dict[tuple, list[Chromosome]] = {}
+        for chromosome in self.individuals:
+            if chromosome.evaluated:
+                continue
+            key = FitnessCache.key(chromosome, improvement)
+            if key in pending:
+                pending[key].append(chromosome)
+                continue
+            entry = self.cache.get(key) if self.cache is not None else None
+            if entry is None:
+                pending[key] = [chromosome]
+            else:
+                self.restore_individual(chromosome, entry, improvement)
+
+        with phase('parallel_evaluation'):
+            results = self.evaluator.map([genotype for _, genotype, _ in pending],
+                                         improvement, late)
+        if Profiler.active is not None:
+            # Las ubicaciones y búsquedas de los procesos no se cuentan
+            Profiler.active.count(evaluations=len(pending))
+        for (key, chromosomes), (entry, late_entry) in zip(pending.items(), results):
+            if self.cache is not None:
+                self.cache.add(key, entry)
+                if late_entry is not None:
+                    self.cache.add(FitnessCache.late_key(key, entry), late_entry)
+            for chromosome in chromosomes:
+                if late_entry is None:
+                    self.restore_individual(chromosome, entry, improvement)
+                else:
+                    self.restore_individual(chromosome, late_entry, improvement, True,
+                                            entry.box_counts)
+        return self
+
+    def improve_late_parallel(self, chromosomes: list[Chromosome]) -> 'Population':
+        """Apply in the parallel evaluator the late improvement of the restored individuals not found in the cache"""
+        pending: dict[tuple, list[Chromosome]] = {}
+        for chromosome in chromosomes:
+            if chromosome.restored and not chromosome.late_improved and \
+                    self.restore_late(chromosome) is None:
+                key = FitnessCache.key(chromosome, chromosome.improvement)
+                pending.setdefault(key, []).append(chromosome)
+        # Repetir la evaluación con la misma mejora y luego mejorar
+        for improvement in Improvement:
+            keys = [key for key in pending if key[0] == improvement.name]
+            with phase('parallel_evaluation'):
+                results = self.evaluator.map([genotype for _, genotype, _ in keys],
+                                             improvement, late=True)
+            if Profiler.active is not None:
+                Profiler.active.count(late_improvements=len(keys))
+            for key, (entry, late_entry) in zip(keys, results):
+                if self.cache is not None:
+                    self.cache.add(FitnessCache.late_key(key, entry), late_entry)
+                for chromosome in pending[key]:
+                    self.restore_individual(chromosome, late_entry, improvement, True,
+                                            entry.box_counts)
+        return self
+
     def evaluate(self) -> 'Population':
-        if self.group_improvement == GroupImprovement.none:
-            self.individuals.sort(key=lambda i: i.evaluate().
-                                  fitness,
-                                  reverse=True)
-        elif self.group_improvement == GroupImprovement.during:
-            self.individuals.sort(key=lambda i: i.evaluate(Improvement.during).
-                                  fitness,
-                                  reverse=True)
+        # El tiempo de las evaluaciones y mejoras se registra en sus propias fases
+        profiler = Profiler.active
+        if profiler is not None:
+            profiler.start('sort')
+        if self.evaluator is not None:
+            self.evaluate_parallel(Improvement.during if self.group_improvement == GroupImprovement.during
+                                   else Improvement.none,
+                                   late=self.group_improvement == GroupImprovement.late_all)
+            if self.group_improvement == GroupImprovement.late_all:
+                self.improve_late_parallel(self.individuals)
+
+        if self.group_improvement in (GroupImprovement.none, GroupImprovement.during):
+            improvement = Improvement.during if self.group_improvement == GroupImprovement.during \
+                else Improvement.none
+            if self.evaluated and len(self.keys) == len(self.individuals):
+                # Solo se ubican en el orden los individuos que cambiaron
+                self.insert_changed(improvement)
+            else:
+                for i in self.individuals:
+                    self.evaluate_individual(i, improvement)
+                self.sort()
         elif self.group_improvement == GroupImprovement.late_all:
-            self.individuals.sort(key=lambda i: i.evaluate().
-                                  evaluate_with_improvement_late(),
-                                  reverse=True)
+            for i in self.individuals:
+                self.improve_late(self.evaluate_individual(i))
+            self.sort()
         else:
-            self.individuals.sort(
-                key=lambda i: i.evaluate().fitness, reverse=True)
+            for i in self.individuals:
+                self.evaluate_individual(i)
+            self.sort()
             if self.group_improvement == GroupImprovement.late_some:
                 # Mejorar el 50% de la población superior
+                if self.evaluator is not None:
+                    self.improve_late_parallel(
+                        self.individuals[:len(self.individuals)//2])
                 for i in self.individuals[:len(self.individuals)//2]:
-                    i.evaluate_with_improvement_late()
+                    self.improve_late(i)
             elif self.group_improvement == GroupImprovement.late_best:
-                self.individuals[0].evaluate_with_improvement_late()
-            self.individuals.sort(
-                key=lambda i: i.fitness, reverse=True)
+                self.improve_late(self.individuals[0])
+            self.sort()
         # print(f"Best fitness: {best_fit}")
         self.evaluated = True
+        if profiler is not None:
+            profiler.stop()
+        return self
+
+    def sort(self) -> 'Population':
+        """Sort the evaluated individuals by fitness, the equal ones keep their order"""
+        keys = [i.fitness_key for i in self.individuals]
+        order = sorted(range(len(keys)), key=keys.__getitem__, reverse=True)
+        self.individuals = [self.individuals[j] for j in order]
+        self.keys = [keys[j] for j in order]
+        return self
+
+    def insert_changed(self, improvement: Optional[Improvement] = None) -> 'Population':
+        """
+        Evaluate the individuals without key and merge them in the order of the others.
+
+        The result is the same as sorting the whole population: the others
+        are already sorted, and the equal ones keep their previous order.
+        Without `improvement` the individuals are already evaluated.
+        """
+        changed = [j for j, key in enumerate(self.keys) if key is None]
+        if not changed:
+            return self
+        for j in changed:
+            chromosome = self.individuals[j]
+            if improvement is not None:
+                self.evaluate_individual(chromosome, improvement)
+            self.keys[j] = chromosome.fitness_key
+        # Orden de sort: clave de mayor a menor y luego la posición anterior
+        changed_set = set(changed)
+        unchanged = [j for j in range(len(self.keys)) if j not in changed_set]
+        changed.sort(key=lambda j: (-self.keys[j], j))
+        order = list(heapq.merge(unchanged, changed, key=lambda j: (-self.keys[j], j)))
+        self.individuals = [self.individuals[j] for j in order]
+        self.keys = [self.keys[j] for j in order]
         return self
 
     def tournament(self, TOURNAMENT_SIZE=2) -> Chromosome:
-        t = random.sample(self.individuals,
+        if len(self.keys) != len(self.individuals):
+            # La lista de individuos se reemplazó desde fuera, se mantiene su orden
+            self.keys = [i.fitness_key for i in self.individuals]
+        # Mismos números aleatorios que random.sample sobre los individuos
+        t = random.sample(range(len(self.individuals)),
                           k=TOURNAMENT_SIZE)
-        max_item = max(t, key=lambda i: i.fitness)
-        return max_item
+        return self.individuals[max(t, key=self.keys.__getitem__)]
 
     def mutation(self, P_MUT: float = 0.05) -> 'Population':
         mutate_total = [0, 0, 0]
 
         for i in range(len(self.individuals)):
             if random.random() < P_MUT:
-                mutate_result, c = self.individuals[i].mutate()
+                with phase('mutation'):
+                    mutate_result, c = self.individuals[i].mutate()
                 self.individuals[i] = c
+                if self.keys:
+                    self.keys[i] = None
                 mutate_total = [a + b for a,
                                 b in zip(mutate_total, mutate_result)]
 
@@ -0,0 +1,188 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .chromosome import Chromosome
+from .compiled_problem import CompiledProblem
+from .gene import Gene
+
+MUTATIONS = ('interchange', 'count', 'rotation')
+
+
+@dataclass
+class PopulationArrays:
+    """
+    Genotypes of a population as matrices, one row per individual.
+
+    `types` is a permutation of the indices of the box types in the compiled
+    problem, `counts` and `rotations` are the box count and the rotation of
+    the gene at the same position. `genes` has the Gene at each position, the
+    operators move it with its numbers, so a gene that does not change is
+    shared with the parent as in Chromosome.crossover_one_point and mutate.
+
+    Attributes:
+        compiled (CompiledProblem): The problem of the population.
+        types (np.ndarray): Index of the box type of every gene.
+        counts (np.ndarray): Number of boxes of every gene.
+        rotations (np.ndarray): Rotation of every gene.
+        genes (np.ndarray): The Gene objects.
+    """
+    compiled: CompiledProblem
+    types: np.ndarray
+    counts: np.ndarray
+    rotations: np.ndarray
+    genes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    @staticmethod
+    def from_chromosomes(compiled: CompiledProblem, chromosomes: list[Chromosome]) -> 'PopulationArrays':
+        genes = np.empty((len(chromosomes), len(compiled.index)), dtype=object)
+        genes[:] = [chromosome.genes for chromosome in chromosomes]
+        flat = genes.ravel().tolist()
+        index = compiled.index
+
+        def column(values: list[int]) -> np.ndarray:
+            return np.fromiter(values, dtype=np.int64, count=len(flat)).reshape(genes.shape)
+        return PopulationArrays(compiled, column([index[g.type.type] for g in flat]),
+                                column([g.box_count for g in flat]),
+                                column([g.rotation for g in flat]), genes)
+
+    @staticmethod
+    def random(compiled: CompiledProblem, count: int, rng: np.random.Generator,
+               max_initial: bool = True) -> 'PopulationArrays':
+        """
+        Random genotypes as Population.generate_random_individuals.
+
+        Args:
+            compiled (CompiledProblem): The problem.
+            count (int): Number of individuals.
+            rng (np.random.Generator): The random numbers.
+            max_initial (bool): The first individual has the maximum counts
+                and no rotation.
+
+        Returns:
+            PopulationArrays: The individuals.
+        """
+        n_types = len(compiled.index)
+        min_counts = np.array(compiled.min_counts, dtype=np.int64)
+        max_counts = np.array(compiled.max_counts, dtype=np.int64)
+        # Cantidad y rotación por tipo, luego se ordenan con la permutación de cada fila
+        counts = rng.integers(min_counts, max_counts + 1, size=(count, n_types))
+        rotations = rng.integers(0, 2, size=(count, n_types))
+        if max_initial and count:
+            counts[0] = max_counts
+            rotations[0] = 0
+        types = rng.permuted(np.tile(np.arange(n_types), (count, 1)), axis=1)
+        counts = np.take_along_axis(counts, types, axis=1)
+        rotations = np.take_along_axis(rotations, types, axis=1)
+        arrays = PopulationArrays(compiled, types, counts, rotations,
+                                  np.empty(types.shape, dtype=object))
+        arrays.build_genes(np.ones(types.shape, dtype=bool))
+        return arrays
+
+    def build_genes(self, mask: np.ndarray):
+        """Create the genes of the positions in `mask` from the numbers"""
+        box_types = self.compiled.problem.box_types
+        rows, columns = np.nonzero(mask)
+        for row, column, t, box_count, rotation in zip(rows.tolist(), columns.tolist(),
+                                                       self.types[mask].tolist(),
+                                                       self.counts[mask].tolist(),
+                                                       self.rotations[mask].tolist()):
+            self.genes[row, column] = Gene(box_types[t], box_count, rotation)
+
+    def chromosome(self, row: int, isMaxInitial: bool = False) -> Chromosome:
+        return Chromosome(self.genes[row].tolist(), self.compiled.problem.container, isMaxInitial)
+
+    def crossover(self, first: np.ndarray, second: np.ndarray, points: np.ndarray) -> 'PopulationArrays':
+        """
+        One point crossover of every row of `first` with the same row of `second`.
+
+        As Chromosome.crossover_one_point, the child has the genes of the
+        first parent before its point, followed by the genes of the second
+        parent whose types are not in them, in their order.
+
+        Args:
+            first (np.ndarray): Rows of the first parents.
+            second (np.ndarray): Rows of the second parents.
+            points (np.ndarray): Crossover point of every child.
+
+        Returns:
+            PopulationArrays: The children, one per row of `first`.
+        """
+        n_types = self.types.shape[1]
+        columns = np.arange(n_types)
+        points = points[:, None]
+        first_types = self.types[first]
+        # Posición de cada tipo en el primer padre
+        position = np.empty_like(first_types)
+        np.put_along_axis(position, first_types, np.broadcast_to(columns, first_types.shape), axis=1)
+        # Genes del segundo padre que no están antes del punto en el primero, en su orden
+        kept = np.take_along_axis(position, self.types[second], axis=1) >= points
+        kept_columns = np.argsort(~kept, axis=1, kind='stable')
+        source = np.take_along_axis(kept_columns, np.maximum(columns - points, 0), axis=1)
+        prefix = columns < points
+
+        def combine(matrix: np.ndarray) -> np.ndarray:
+            return np.where(prefix, matrix[first], np.take_along_axis(matrix[second], source, axis=1))
+        return PopulationArrays(self.compiled, combine(self.types), combine(self.counts),
+                                combine(self.rotations), combine(self.genes))
+
+    def mutate(self, rows: np.ndarray, kinds: np.ndarray, rng: np.random.Generator,
+               variation: float = 0.1) -> 'PopulationArrays':
+        """
+        Mutate one gene of every row in place, as Chromosome.mutate.
+
+        Args:
+            rows (np.ndarray): The different rows to mutate.
+            kinds (np.ndarray): Index in MUTATIONS of the mutation of every row.
+            rng (np.random.Generator): The random numbers.
+            variation (float): Variation of the count mutation, as Gene.mutate_quantity.
+
+        Returns:
+            PopulationArrays: This population.
+        """
+        n_types = self.types.shape[1]
+        changed = np.zeros(self.types.shape, dtype=bool)
+
+        # Intercambiar dos genes distintos
+        swapped = rows[kinds == 0]
+        i = rng.integers(0, n_types, size=len(swapped))
+        j = rng.integers(0, n_types - 1, size=len(swapped))
+        j += j >= i
+        for matrix in (self.types, self.counts, self.rotations, self.genes):
+            matrix[swapped, i], matrix[swapped, j] = matrix[swapped, j], matrix[swapped, i]
+
+        # Variar la cantidad en un porcentaje, o elegirla en el rango si es 0
+        counted = rows[kinds == 1]
+        i = rng.integers(0, n_types, size=len(counted))
+        t = self.types[counted, i]
+        min_counts = np.array(self.compiled.min_counts)[t]
+        max_counts = np.array(self.compiled.max_counts)[t]
+        box_counts = self.counts[counted, i]
+        new_counts = np.where(box_counts == 0,
+                              rng.uniform(min_counts, max_counts),
+                              box_counts * (1 + rng.uniform(-variation, variation, size=len(counted))))
+        self.counts[counted, i] = np.clip(new_counts.astype(np.int64), min_counts, max_counts)
+        changed[counted, i] = True
+
+        # Cambiar la rotación
+        rotated = rows[kinds == 2]
+        i = rng.integers(0, n_types, size=len(rotated))
+        self.rotations[rotated, i] = 1 - self.rotations[rotated, i]
+        changed[rotated, i] = True
+
+        self.build_genes(changed)
+        return self
+
+
+def tournament(count: int, population_size: int, size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Winners of `count` tournaments of `size` different individuals of a population sorted by fitness.
+
+    Returns:
+        np.ndarray: Index of every winner, the lowest index of its tournament.
+    """
+    candidates = rng.random((count, population_size)).argpartition(size - 1, axis=1)[:, :size]
+    return candidates.min(axis=1)
@@ -0,0 +1,83 @@
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+import time
+from typing import ClassVar, Iterator, Optional
+
+NO_PHASE = nullcontext()
+
+
+@dataclass
+class Profiler:
+    """
+    Wall time and call count of the phases of a GA run, and counters of its work.
+
+    The phases can be nested, the time of each one excludes the time of the
+    phases inside it, so the times of all the phases add up to the duration
+    of the run. The profiler only records while it is the `active` one.
+
+    Attributes:
+        times (Counter): Seconds spent in each phase.
+        calls (Counter): Number of times each phase was run.
+        counts (Counter): Total of every counter, as evaluations or placements.
+        generations (list[dict]): The counters of every finished generation.
+        active (Profiler): The profiler that records the phases, None when
+            profiling is off.
+    """
+    times: Counter = field(default_factory=Counter)
+    calls: Counter = field(default_factory=Counter)
+    counts: Counter = field(default_factory=Counter)
+    generations: list[dict] = field(default_factory=list)
+    generation: Counter = field(default_factory=Counter, repr=False)
+    # Fases abiertas: [nombre, inicio, tiempo de las fases internas]
+    stack: list[list] = field(default_factory=list, repr=False)
+
+    active: ClassVar[Optional['Profiler']] = None
+
+    def start(self, name: str):
+        self.stack.append([name, time.perf_counter(), 0.])
+
+    def stop(self, **counts: int):
+        """Close the last phase started and add the counters"""
+        name, start, inner = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.times[name] += elapsed - inner
+        self.calls[name] += 1
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        if counts:
+            self.count(**counts)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def count(self, **counts: int):
+        for name, value in counts.items():
+            self.counts[name] += value
+            self.generation[name] += value
+
+    def end_generation(self) -> dict:
+        """Save and return the counters of the generation that just finished"""
+        counts = dict(self.generation)
+        self.generations.append(counts)
+        self.generation.clear()
+        return counts
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'phases': {name: {'seconds': self.times[name], 'calls': self.calls[name]}
+                       for name in self.times},
+            'counts': dict(self.counts),
+            'generations': self.generations,
+        }
+
+
+def phase(name: str):
+    """Time a phase in the active profiler, does nothing when profiling is off"""
+    return Profiler.active.phase(name) if Profiler.active is not None else NO_PHASE
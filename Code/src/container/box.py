@@ -3,10 +3,11 @@ from dataclasses import dataclass
 from lcp.src.location import Space, Size, Position
 
 
-@dataclass
+@dataclass(slots=True)
 class Box(Space):
     type: int
 
     def __init__(self, position: Position, size: Size, box_type: int):
-        super().__init__(position, size)
+        # slots=True crea una clase nueva, super() sin argumentos no funciona
+        Space.__init__(self, position, size)
         self.type = box_type
@@ -1,9 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from lcp.src.location import Size
 
 
-@dataclass
+@dataclass(slots=True)
 class BoxType(Size):
     """Represent the type of box and its properties"""
     type: int  # Identifies the type of box
@@ -11,3 +11,11 @@ class BoxType(Size):
     max_count: int  # Number of maximum boxes of this type
     value_individual: int  # Value of a single box of this type
     weight: int  # Weight of a single box of this type
+    # Size of the box in each rotation, shared by all the genes of this type
+    rotations: tuple[Size, Size] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # slots=True crea una clase nueva, super() sin argumentos no funciona
+        Size.__post_init__(self)
+        self.rotations = (Size(self.length, self.width, self.height),
+                          Size(self.width, self.length, self.height))
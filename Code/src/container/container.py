@@ -3,10 +3,11 @@ from dataclasses import dataclass, field
 from lcp.src.location import Size
 
 
-@dataclass
+@dataclass(slots=True)
 class Container(Size):
     dimension: list[int] = field(init=False)
 
     def __post_init__(self):
-        super().__post_init__()
+        # slots=True crea una clase nueva, super() sin argumentos no funciona
+        Size.__post_init__(self)
         self.dimension = [self.length, self.width, self.height]
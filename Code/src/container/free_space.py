@@ -6,15 +6,18 @@ from typing import Optional
 from lcp.src.location import Space, Size, Position
 
 
-@dataclass
+@dataclass(slots=True)
 class FreeSpace(Space):
     group: str
     type: Optional[int] = field(default=None, repr=False)
 
     def split(self, size: Size, box_type: int) -> tuple[list['FreeSpace'], list['FreeSpace'], list['FreeSpace']]:
         """Divide the space into three spaces: side, front and top"""
-        x, y, z, l, w, h = self
-        inner_l, inner_w, inner_h = size
+        # Leer los atributos directamente, sin desempaquetar
+        position, space_size = self.position, self.size
+        x, y, z = position.x, position.y, position.z
+        l, w, h = space_size.length, space_size.width, space_size.height
+        inner_l, inner_w, inner_h = size.length, size.width, size.height
 
         if inner_l <= 0 or inner_w <= 0 or inner_h <= 0:
             logging.warning(
@@ -28,14 +31,14 @@ class FreeSpace(Space):
 
         # side = [FreeSpace(Position(x, y + inner_w, z),
         #                  Size(inner_l, w - inner_w, inner_h))] if w - inner_w > 0 else []
-        side = [FreeSpace(Position(x, y + inner_w, z),
+        side = [FreeSpace(Position.unchecked(x, y + inner_w, z),
                           Size(inner_l, w - inner_w, h), 'side', box_type)] if w - inner_w > 0 else []
         # top = [FreeSpace(Position(x, y, z + inner_h),
         #                 Size(inner_l, w, h - inner_h))] if h > inner_h else []
-        top = [FreeSpace(Position(x, y, z + inner_h),
+        top = [FreeSpace(Position.unchecked(x, y, z + inner_h),
                          Size(inner_l, inner_w, h - inner_h), 'top', box_type)] if h > inner_h else []
 
-        front = [FreeSpace(Position(x + inner_l, y, z),
+        front = [FreeSpace(Position.unchecked(x + inner_l, y, z),
                            Size(l - inner_l, w, h), 'front', box_type)] if l - inner_l > 0 else []
 
         return side, top, front
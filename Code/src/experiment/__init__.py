@@ -0,0 +1,2 @@
+from .results_file import ResultsFile
+from .runner import ExperimentRunner
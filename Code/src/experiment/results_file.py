@@ -0,0 +1,98 @@
+from dataclasses import dataclass, field
+import json
+import logging
+import os
+import time
+from typing import IO, Iterator, Optional
+
+
+@dataclass
+class ResultsFile:
+    """
+    Append-only JSON Lines file of results that survives crashes.
+
+    Every result is written as one line and flushed at once, so it is kept
+    if the process dies. The file is synced to disk every SYNC_EVERY results
+    or SYNC_SECONDS seconds, and when it is closed. A line cut by a crash is
+    removed when the file is opened again.
+
+    Attributes:
+        file_path (str): The path of the JSONL file.
+        SYNC_EVERY (int): Results written between two syncs to disk.
+        SYNC_SECONDS (float): Maximum seconds between two syncs to disk.
+    """
+    file_path: str
+    SYNC_EVERY: int = field(default=10)
+    SYNC_SECONDS: float = field(default=30)
+
+    file: Optional[IO] = field(default=None, init=False, repr=False)
+    unsynced: int = field(default=0, init=False, repr=False)
+    last_sync: float = field(default=0, init=False, repr=False)
+
+    def __enter__(self) -> 'ResultsFile':
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self) -> Iterator[dict]:
+        """The results saved in the file, skipping a line cut by a crash"""
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, 'r') as file:
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning("Invalid line %d in '%s' ignored", number, self.file_path)
+
+    def keys(self, fields: tuple[str, ...]) -> set[tuple]:
+        """The values of `fields` of every saved result"""
+        return {tuple(result[f] for f in fields) for result in self.read()}
+
+    def open(self) -> 'ResultsFile':
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.file_path, 'a+b')
+        # Eliminar la última línea si quedó incompleta
+        end = self.complete_size()
+        if end < self.file.seek(0, os.SEEK_END):
+            logging.warning("Incomplete last line in '%s' removed", self.file_path)
+            self.file.truncate(end)
+        self.last_sync = time.monotonic()
+        return self
+
+    def complete_size(self, chunk: int = 1 << 16) -> int:
+        """Size of the file up to the end of its last complete line"""
+        end = self.file.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - chunk)
+            self.file.seek(start)
+            data = self.file.read(end - start)
+            newline = data.rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+        return 0
+
+    def write(self, result: dict):
+        self.file.write(json.dumps(result).encode() + b'\n')
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.SYNC_EVERY or time.monotonic() - self.last_sync >= self.SYNC_SECONDS:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
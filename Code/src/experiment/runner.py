@@ -0,0 +1,202 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Callable, Hashable, Iterable, Optional
+
+from .results_file import ResultsFile
+
+Job = tuple[tuple, tuple]
+
+
+def _run_job(function: Callable, args: tuple, budget: Optional[float]) -> tuple[dict, float]:
+    """Run a job in a worker, returns its result and the seconds it took"""
+    start = time.perf_counter()
+    result = function(args) if budget is None else function(args, budget)
+    return result, time.perf_counter() - start
+
+
+@dataclass
+class ExperimentRunner:
+    """
+    Run experiment jobs in a pool of processes saving each result as it finishes.
+
+    Each job is a key and the arguments of the function that solves it. The
+    key is the value of `key_fields` in the result, so on a restart the jobs
+    whose results are already in the file are skipped. At most `max_pending`
+    jobs are submitted at a time, so the memory does not grow with the
+    number of jobs, and a process that finishes a job takes the next one.
+
+    With `cost`, the jobs are run from the most expensive to the cheapest, so
+    the long jobs do not remain at the end with most processes idle. With
+    `budget`, every job receives the seconds it may run as a second argument.
+    With `MAX_BUDGET_FACTOR` above 1, the seconds not used by the jobs that
+    stop early are shared among the jobs not started yet, each one at most
+    `MAX_BUDGET_FACTOR` times the budget. The jobs of the same
+    `budget_group` then receive the budget of the first one started, so
+    they can still be compared under the same time limit.
+
+    With `settings`, every result is saved with them, and a file with
+    results obtained with other settings is not resumed.
+
+    Attributes:
+        results (ResultsFile): The file where the results are appended.
+        max_workers (int): Number of processes.
+        max_pending (int): Jobs submitted and not finished, by default twice
+            the number of processes.
+        key_fields (tuple[str, ...]): Fields of a result that identify its job.
+        cost (Optional[Callable]): Expected cost of a job from its arguments,
+            in any unit.
+        budget (Optional[float]): Seconds of every job.
+        MAX_BUDGET_FACTOR (float): Maximum budget of a job relative to
+            `budget`, 1 gives every job the same budget.
+        budget_group (Optional[Callable]): Group of a job from its key, the
+            jobs of a group have the same budget.
+        settings (Optional[dict]): Settings of the experiment saved in the
+            'settings' field of every result, only JSON values.
+        completed (int): Jobs finished in the last run.
+        skipped (int): Jobs skipped in the last run because they were in the file.
+        failed (list[tuple]): Keys of the jobs that raised an exception in the last run.
+    """
+    results: ResultsFile
+    max_workers: int = field(default=8)
+    max_pending: Optional[int] = field(default=None)
+    key_fields: tuple[str, ...] = field(default=('problem_id', 'group_improvement'))
+    cost: Optional[Callable[[tuple], float]] = field(default=None)
+    budget: Optional[float] = field(default=None)
+    MAX_BUDGET_FACTOR: float = field(default=1)
+    budget_group: Optional[Callable[[tuple], Hashable]] = field(default=None)
+    settings: Optional[dict] = field(default=None)
+
+    completed: int = field(default=0, init=False)
+    skipped: int = field(default=0, init=False)
+    failed: list[tuple] = field(default_factory=list, init=False)
+    # Estado de la ejecución para la proyección del tiempo restante
+    saved_seconds: float = field(default=0, init=False, repr=False)
+    unstarted_jobs: int = field(default=0, init=False, repr=False)
+    group_budgets: dict = field(default_factory=dict, init=False, repr=False)
+    # Costo esperado de los trabajos sin terminar y segundos por unidad de costo observados
+    remaining_cost: float = field(default=0, init=False, repr=False)
+    remaining_jobs: int = field(default=0, init=False, repr=False)
+    finished_cost: float = field(default=0, init=False, repr=False)
+    finished_seconds: float = field(default=0, init=False, repr=False)
+
+    def pending_jobs(self, jobs: Iterable[Job]) -> Iterable[Job]:
+        """The jobs without a result in the file"""
+        done = set()
+        for result in self.results.read():
+            if self.settings is not None and result.get('settings') != self.settings:
+                raise ValueError("The results in '%s' were obtained with other settings than %s" %
+                                 (self.results.file_path, self.settings))
+            done.add(tuple(result[f] for f in self.key_fields))
+        self.skipped = 0
+        for key, args in jobs:
+            if tuple(key) in done:
+                self.skipped += 1
+            else:
+                yield key, args
+
+    def run(self, function: Callable[[tuple], dict], jobs: Iterable[Job],
+            onResult: Optional[Callable[[dict], None]] = None) -> 'ExperimentRunner':
+        """
+        Run the jobs not saved yet.
+
+        Args:
+            function (Callable): Picklable function that receives the arguments
+                of a job, and its budget in seconds if `budget`, and returns its
+                result.
+            jobs (Iterable[Job]): The (key, arguments) of every job.
+            onResult (Optional[Callable]): Called with every saved result.
+
+        Returns:
+            ExperimentRunner: The runner, with the counters of the run.
+        """
+        max_pending = self.max_pending or 2 * self.max_workers
+        self.completed = 0
+        self.failed = []
+        self.saved_seconds = 0.
+        self.group_budgets = {}
+        self.finished_cost = self.finished_seconds = 0.
+        # Sin costo esperado todos los trabajos cuestan lo mismo y se mantiene el orden
+        scheduled = [(self.cost(args) if self.cost is not None else 1., key, args)
+                     for key, args in self.pending_jobs(jobs)]
+        if self.cost is not None:
+            # Primero los trabajos más costosos
+            scheduled.sort(key=lambda job: job[0], reverse=True)
+        costs = {key: cost for cost, key, _ in scheduled}
+        self.remaining_cost = sum(costs.values())
+        self.remaining_jobs = self.unstarted_jobs = len(scheduled)
+        jobs = iter([(key, args) for _, key, args in scheduled])
+        pending: dict[Future, tuple[tuple, Optional[float]]] = {}
+        with self.results, ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                # Mantener la cola llena sin pasar del máximo
+                for key, args in jobs:
+                    budget = self.next_budget(key)
+                    self.unstarted_jobs -= 1
+                    pending[executor.submit(_run_job, function, args, budget)] = key, budget
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key, budget = pending.pop(future)
+                    self.remaining_cost -= costs[key]
+                    self.remaining_jobs -= 1
+                    try:
+                        result, seconds = future.result()
+                    except Exception:
+                        logging.exception("Job %s failed", key)
+                        self.failed.append(key)
+                        continue
+                    if budget is not None:
+                        self.saved_seconds += max(0., budget - seconds)
+                    self.finished_cost += costs[key]
+                    self.finished_seconds += seconds
+                    if self.settings is not None:
+                        result['settings'] = self.settings
+                    self.results.write(result)
+                    self.completed += 1
+                    if callable(onResult):
+                        onResult(result)
+        return self
+
+    def next_budget(self, key: tuple) -> Optional[float]:
+        """Budget of the next job, with its share of the seconds saved by the finished jobs"""
+        if self.budget is None:
+            return None
+        group = self.budget_group(key) if self.budget_group is not None else None
+        if group in self.group_budgets:
+            budget = self.group_budgets[group]
+            # Puede usar más de lo ahorrado, lo que falta se descuenta de lo próximo
+            self.saved_seconds -= budget - self.budget
+            return budget
+        jobs = max(1, self.unstarted_jobs)
+        extra = max(0., min(self.saved_seconds / jobs, (self.MAX_BUDGET_FACTOR - 1) * self.budget))
+        self.saved_seconds -= extra
+        if group is not None:
+            self.group_budgets[group] = self.budget + extra
+        return self.budget + extra
+
+    def projection(self) -> dict:
+        """
+        Projected end of the run, from the expected cost of the unfinished jobs.
+
+        The cost is converted to seconds with the seconds per unit of cost of the
+        finished jobs, and limited by the budget of every job.
+
+        Returns:
+            dict: The unfinished jobs, the projected seconds until all of them
+                finish and the projected end as a timestamp.
+        """
+        if not self.finished_cost or not self.remaining_jobs:
+            seconds = 0. if not self.remaining_jobs else float('nan')
+        else:
+            seconds = self.remaining_cost * self.finished_seconds / self.finished_cost
+            if self.budget is not None:
+                seconds = min(seconds, self.remaining_jobs * self.budget * self.MAX_BUDGET_FACTOR)
+            seconds /= self.max_workers
+        return {'remaining_jobs': self.remaining_jobs,
+                'remaining_seconds': seconds,
+                'end_time': time.time() + seconds}
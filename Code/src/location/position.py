@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     """Representa la posición de un objeto en un espacio"""
     x: int
@@ -16,6 +16,15 @@ class Position:
         if self.z < 0:
             raise ValueError("El valor de 'z' debe ser positivo")
 
+    @classmethod
+    def unchecked(cls, x: int, y: int, z: int) -> 'Position':
+        """Crea una posición sin validar las coordenadas, para coordenadas calculadas de otras ya válidas"""
+        position = object.__new__(cls)
+        position.x = x
+        position.y = y
+        position.z = z
+        return position
+
     def __str__(self) -> str:
         return f"(x={self.x}, y={self.y}, z={self.z})"
 
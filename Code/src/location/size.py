@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class Size:
     """Representa las dimensiones de un espacio o caja"""
     length: int
@@ -1,16 +1,16 @@
 from dataclasses import dataclass
-from itertools import chain
 
 from . import Position, Size
 
 
-@dataclass
+@dataclass(slots=True)
 class Space:
     position: Position
     size: Size
 
     def __iter__(self):
-        return iter(chain(self.position, self.size))
+        position, size = self.position, self.size
+        return iter([position.x, position.y, position.z, size.length, size.width, size.height])
 
     def __str__(self) -> str:
         return f"{self.position} {self.size}"
@@ -1,2 +1,4 @@
 from .problems import Problems
 from .problem import Problem
+from .problem_cache import ProblemCache
+from .bounds import ProblemBounds
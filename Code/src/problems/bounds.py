@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from fractions import Fraction
+
+from lcp.src.container import BoxType, Container
+from .problem import Problem
+
+
+@dataclass
+class ProblemBounds:
+    """
+    Upper bounds of the value of any solution of a problem.
+
+    Only the box types that fit in the container, in one of the rotations of
+    the genes, count. Each type counts at most its maximum number of boxes
+    and the number of boxes whose volume fits in the container.
+
+    Attributes:
+        total_value (int): Value of all the boxes that count.
+        knapsack_value (int): Value of the fractional knapsack relaxation,
+            the volume of the container filled with the boxes of the highest
+            value per volume, the last one in part, rounded down.
+        container_volume (int): Volume of the container.
+    """
+    total_value: int
+    knapsack_value: int
+    container_volume: int
+
+    @property
+    def upper_bound(self) -> int:
+        return min(self.total_value, self.knapsack_value)
+
+    def gap(self, value: int) -> float:
+        """Difference between the upper bound and a value relative to the bound, 0 when the value is optimal"""
+        bound = self.upper_bound
+        return max(0., (bound - value) / bound) if bound > 0 else 0.
+
+    @staticmethod
+    def fits(box_type: BoxType, container: Container) -> bool:
+        """The box fits in the container with its height up, in one of the two rotations"""
+        return box_type.height <= container.height and any(
+            size.length <= container.length and size.width <= container.width
+            for size in box_type.rotations)
+
+    @staticmethod
+    def compute(problem: Problem) -> 'ProblemBounds':
+        container = problem.container
+        volume = container.volume
+        # Cantidad, valor y volumen de cada tipo que cabe
+        items = [(min(t.max_count, volume // t.volume), t.value_individual, t.volume)
+                 for t in problem.box_types if ProblemBounds.fits(t, container)]
+        items = [item for item in items if item[0] > 0]
+        total_value = sum(count * value for count, value, _ in items)
+
+        # Mayor valor por volumen primero, sin redondeos que cambien el orden
+        items.sort(key=lambda item: Fraction(item[1], item[2]), reverse=True)
+        knapsack_value = 0
+        free = volume
+        for count, value, box_volume in items:
+            if count * box_volume <= free:
+                knapsack_value += count * value
+                free -= count * box_volume
+            else:
+                knapsack_value += free * value // box_volume
+                break
+        return ProblemBounds(total_value, knapsack_value, volume)
@@ -0,0 +1,138 @@
+from dataclasses import dataclass, field
+import os
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from lcp.src.container import BoxType, Container
+from .problem import Problem
+from .problems import Problems
+
+PROBLEM_DTYPE = np.dtype([('id', np.int64), ('length', np.int64), ('width', np.int64),
+                          ('height', np.int64), ('first_box', np.int64), ('box_count', np.int64),
+                          ('text_id', np.bool_)])
+BOX_DTYPE = np.dtype([('type', np.int64), ('length', np.int64), ('width', np.int64),
+                      ('height', np.int64), ('min_count', np.int64), ('max_count', np.int64),
+                      ('value', np.int64), ('weight', np.int64)])
+
+
+@dataclass
+class ProblemCache:
+    """
+    Compiled problem set in two memory-mapped NumPy files.
+
+    `<name>.problems.npy` has one fixed-width record per problem, with its
+    id, its container and the range of its box types in `<name>.boxes.npy`,
+    which has one record per box type. The ids are stored as integers, with
+    a flag for the ids that were strings (those of the literature problems),
+    so the problems keep the type of their id.
+    Opening the cache only reads the headers and the ids, a problem is read
+    when it is requested, so a process that needs one problem does not parse
+    the whole set.
+
+    Attributes:
+        path (str): Path of the files without the '.problems.npy' and
+            '.boxes.npy' suffixes.
+    """
+    path: str
+    problems: np.ndarray = field(init=False, repr=False)
+    boxes: np.ndarray = field(init=False, repr=False)
+    index: dict[Union[int, str], int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.problems = np.load(self.path + '.problems.npy', mmap_mode='r')
+        self.boxes = np.load(self.path + '.boxes.npy', mmap_mode='r')
+        ids = self.problems['id'].tolist()
+        # Los caches sin la columna solo tienen ids enteros
+        text_ids = (self.problems['text_id'].tolist() if 'text_id' in self.problems.dtype.names
+                    else [False] * len(ids))
+        self.index = {str(problem_id) if text_id else problem_id: row
+                      for row, (problem_id, text_id) in enumerate(zip(ids, text_ids))}
+
+    def __len__(self) -> int:
+        return len(self.problems)
+
+    def __iter__(self) -> Iterator[Problem]:
+        return (self.problem(problem_id) for problem_id in self.ids)
+
+    @property
+    def ids(self) -> list[Union[int, str]]:
+        return list(self.index)
+
+    def problem(self, problem_id: Union[int, str]) -> Problem:
+        """Build the problem with the given id, as Problems.load_problems does"""
+        record = self.problems[self.index[problem_id]]
+        first = int(record['first_box'])
+        boxes = self.boxes[first:first + int(record['box_count'])].tolist()
+        box_types = [BoxType(length=length, width=width, height=height, type=type,
+                             min_count=min_count, max_count=max_count,
+                             value_individual=value, weight=weight)
+                     for type, length, width, height, min_count, max_count, value, weight in boxes]
+        container = Container(length=int(record['length']),
+                              width=int(record['width']),
+                              height=int(record['height']))
+        return Problem(problem_id, container, box_types)
+
+    @staticmethod
+    def compile(file_path: str, path: Optional[str] = None) -> 'ProblemCache':
+        """
+        Compile a JSON problem set of Problems into a cache.
+
+        Args:
+            file_path (str): The JSON file of the problems.
+            path (Optional[str]): Path of the cache, by default the JSON file
+                without its extension.
+
+        Returns:
+            ProblemCache: The cache, opened.
+        """
+        path = path or os.path.splitext(file_path)[0]
+        return ProblemCache.compile_problems(Problems(file_path=file_path).load_problems(), path)
+
+    @staticmethod
+    def compile_literature(file_path: str, path: Optional[str] = None) -> 'ProblemCache':
+        """
+        Compile a local OR-Library thpack file, plain or gzip, into a cache.
+
+        Args:
+            file_path (str): The thpack file.
+            path (Optional[str]): Path of the cache, by default the file
+                without its '.gz' and '.txt' extensions.
+
+        Returns:
+            ProblemCache: The cache, opened.
+        """
+        if path is None:
+            path = file_path[:-3] if file_path.endswith('.gz') else file_path
+            path = os.path.splitext(path)[0]
+        return ProblemCache.compile_problems(Problems(file_path=file_path).read_literature_problems(), path)
+
+    @staticmethod
+    def compile_problems(problems: Iterable[Problem], path: str) -> 'ProblemCache':
+        """Write the problems in a cache, reading them one at a time"""
+        problem_records: list[tuple] = []
+        box_records: list[tuple] = []
+        for problem in problems:
+            container = problem.container
+            problem_records.append((int(problem.id), container.length, container.width,
+                                    container.height, len(box_records), len(problem.box_types),
+                                    isinstance(problem.id, str)))
+            box_records += [(t.type, t.length, t.width, t.height, t.min_count, t.max_count,
+                             t.value_individual, t.weight) for t in problem.box_types]
+        # Escribir con otro nombre y reemplazar, otros procesos pueden estar leyendo el cache
+        for suffix, records, dtype in (('.boxes.npy', box_records, BOX_DTYPE),
+                                       ('.problems.npy', problem_records, PROBLEM_DTYPE)):
+            temporary = path + '.tmp' + suffix
+            np.save(temporary, np.array(records, dtype=dtype))
+            os.replace(temporary, path + suffix)
+        return ProblemCache(path)
+
+    @staticmethod
+    def open(file_path: str) -> 'ProblemCache':
+        """Open the cache of a JSON problem set, compiling it if it is missing or older than the JSON"""
+        path = os.path.splitext(file_path)[0]
+        cache_files = [path + '.problems.npy', path + '.boxes.npy']
+        if all(os.path.exists(f) and os.path.getmtime(f) >= os.path.getmtime(file_path)
+               for f in cache_files):
+            return ProblemCache(path)
+        return ProblemCache.compile(file_path, path)
@@ -1,10 +1,12 @@
 
 
+import gzip
 import json
 import logging
 from os import makedirs
 import os
 from dataclasses import dataclass, field
+from typing import Iterable, Iterator
 
 from lcp.src.container import BoxType, Container
 from lcp.src.problems.problem import Problem
@@ -74,13 +76,33 @@ class Problems:
         return problems
 
     def load_literature_problems(self) -> list[Problem]:
-        problems = []
         file_url = "https://people.brunel.ac.uk/~mastjjb/jeb/orlib/files/%s" % self.file_path
         import requests
         response = requests.get(file_url)
         lines = response.iter_lines(decode_unicode=True)
+        return list(self.parse_literature_problems(lines))
+
+    def read_literature_problems(self) -> Iterator[Problem]:
+        """
+        Read the problems of a local OR-Library thpack file, plain or compressed with gzip.
+
+        The file is read while the problems are consumed, without loading it whole.
+
+        Yields:
+            Problem: Each problem of the file.
+        """
+        with open(self.file_path, 'rb') as file:
+            compressed = file.read(2) == b'\x1f\x8b'
+        opener = gzip.open if compressed else open
+        with opener(self.file_path, 'rt') as file:
+            yield from self.parse_literature_problems(file)
+
+    @staticmethod
+    def parse_literature_problems(lines: Iterable[str]) -> Iterator[Problem]:
+        """Parse the lines of a thpack file, yielding each problem as soon as it is read"""
+        # Ignorar líneas vacías
+        lines = (line for line in lines if line.strip())
         count_problems = int(next(lines))
-        problems = []
         for i in range(count_problems):
             problem_number, seed_number = map(int, next(lines).split())
             container_length, container_width, container_height = map(
@@ -101,6 +123,4 @@ class Problems:
             container = Container(length=container_length,
                                   width=container_width,
                                   height=container_height)
-            problem = Problem(str(problem_number), container, box_types)
-            problems.append(problem)
-        return problems
+            yield Problem(str(problem_number), container, box_types)